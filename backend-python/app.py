@@ -5,17 +5,14 @@ import flask.cli
 from dotenv import load_dotenv
 from src.routes.generate_routes import generate_bp
 from src.routes.embed_routes import embed_bp
-from src.models.model_manager import initialize_models
-from src.services.rag_service import initialize_rag_system
+from src.models.model_manager import get_device_info
+from src.services.rag_service import is_rag_initialized
+from src.services.readiness import get_readiness, model_load_mode, start_component_loading
 import json
 
 # 환경변수 로드
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app)
-app.config['JSON_AS_ASCII'] = False  # 한글 깨짐 방지
-
 # 콘솔 배너 출력 시 Windows 핸들 오류를 피하기 위해 배너 비활성화 및 컬러 출력 끔
 flask.cli.show_server_banner = lambda *args, **kwargs: None
 os.environ.setdefault("CLICOLOR", "0")
@@ -23,43 +20,98 @@ os.environ.setdefault("NO_COLOR", "1")
 os.environ.setdefault("COLORAMA_DISABLE", "1")
 os.environ.setdefault("TERM", "dumb")
 
-# 모델 초기화
-print("🔄 Loading LLM Model...")
-initialize_models()
-
-# RAG 시스템 초기화
-print("🔄 Initializing RAG system...")
-rag_initialized = initialize_rag_system()
-if rag_initialized:
-    print("✅ RAG system initialized successfully")
-else:
-    print("⚠️ RAG system initialization failed, using fallback LLM")
-
-# Blueprint 등록
-app.register_blueprint(generate_bp, url_prefix='/generate')
-app.register_blueprint(embed_bp, url_prefix='/embed')
-
-@app.route('/health', methods=['GET'])
-def health():
-    return jsonify({
-        'status': 'OK',
-        'service': 'Poly-i Python LLM Server',
-        'timestamp': __import__('datetime').datetime.now().isoformat(),
-        'rag_initialized': rag_initialized
-    })
-
-@app.route('/info', methods=['GET'])
-def info():
-    return jsonify({
-        'model': 'Meta-Llama-3.1-8B-Instruct',
-        'quantization': 'GGUF (Q4_K_M)',
-        'embedding_model': os.getenv('EMBEDDING_MODEL_NAME', 'Qwen/Qwen3-Embedding-0.6B'),
-        'rag_system': 'Enabled' if rag_initialized else 'Disabled',
-        'max_tokens': 512,
-        'device': 'cuda' if __import__('torch').cuda.is_available() else 'cpu'
-    })
+
+def load_components(blocking: bool = True):
+    """
+    LLM/임베딩 모델과 RAG 인덱스를 병렬로 로드.
+    blocking=False이면 백그라운드에서 로드하고 바로 반환 (로딩 중에는 키워드 응답만 제공, GET /ready로 확인).
+    gunicorn preload 시에는 fork 전에 끝나야 하므로 blocking으로 마스터에서 한 번만 실행.
+    """
+    print(f"🔄 Loading LLM / embedding model / RAG index ({'blocking' if blocking else 'background'})...")
+    start_component_loading(blocking=blocking)
+    if blocking:
+        readiness = get_readiness()
+        if readiness['components']['rag']['state'] == 'ready':
+            print("✅ RAG system initialized successfully")
+        else:
+            print("⚠️ RAG system initialization failed, using fallback LLM")
+
+
+def create_app(load: bool = True) -> Flask:
+    """
+    Flask 앱 팩토리.
+    - 개발 서버: python app.py
+    - 운영: gunicorn -c gunicorn.conf.py wsgi:app (모델을 마스터에서 로드한 뒤 워커를 fork)
+    - MODEL_LOAD_MODE=background(기본)|blocking
+    """
+    app = Flask(__name__)
+    CORS(app)
+    app.config['JSON_AS_ASCII'] = False  # 한글 깨짐 방지
+
+    if load:
+        load_components(blocking=model_load_mode() == 'blocking')
+
+    # Blueprint 등록
+    app.register_blueprint(generate_bp, url_prefix='/generate')
+    app.register_blueprint(embed_bp, url_prefix='/embed')
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        return jsonify({
+            'status': 'OK',
+            'service': 'Poly-i Python LLM Server',
+            'timestamp': __import__('datetime').datetime.now().isoformat(),
+            'rag_initialized': is_rag_initialized(),
+            'pid': os.getpid(),
+        })
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        """구성 요소별 로딩 상태. 로딩이 끝나면 200 (일부 실패 시 status=degraded), 아니면 503."""
+        result = get_readiness()
+        return jsonify(result), 200 if result['ready'] else 503
+
+    @app.route('/stats', methods=['GET'])
+    def stats():
+        from src.services.embedding_batcher import get_batcher_stats
+        from src.services.rag_service import get_query_cache_stats
+        from src.services.inference_scheduler import get_scheduler_stats
+        from src.services.response_cache import get_response_cache_stats
+        from src.services.semantic_cache import get_semantic_cache_stats
+        return jsonify({
+            'pid': os.getpid(),
+            'llm_scheduler': get_scheduler_stats(),
+            'embedding_batcher': get_batcher_stats(),
+            'query_embedding_cache': get_query_cache_stats(),
+            'response_cache': get_response_cache_stats(),
+            'semantic_cache': get_semantic_cache_stats(),
+        })
+
+    @app.route('/stats/spans', methods=['GET'])
+    def span_stats():
+        """구간별 소요 시간 히스토그램 (?reset=1 이면 조회 후 초기화)."""
+        from src.services.tracing import get_span_stats, reset_span_stats
+        result = get_span_stats()
+        if request.args.get('reset') in ('1', 'true'):
+            reset_span_stats()
+        return jsonify(result)
+
+    @app.route('/info', methods=['GET'])
+    def info():
+        return jsonify({
+            'model': 'Meta-Llama-3.1-8B-Instruct',
+            'quantization': 'GGUF (Q4_K_M)',
+            'embedding_model': os.getenv('EMBEDDING_MODEL_NAME', 'Qwen/Qwen3-Embedding-0.6B'),
+            'rag_system': 'Enabled' if is_rag_initialized() else 'Disabled',
+            'max_tokens': 512,
+            'device': get_device_info()['device'],
+        })
+
+    return app
+
 
 if __name__ == '__main__':
+    app = create_app()
     port = int(os.getenv('PYTHON_PORT', 5001))
     print(f"🚀 Starting Python LLM Server on port {port}")
     # Windows 콘솔 핸들 오류를 피하기 위해 reloader/디버거 비활성화
@@ -1,10 +1,41 @@
+import argparse
+import json
 import os
 
-from src.services.rag_service import initialize_rag_system
+from src.models.model_manager import initialize_embedding_model
+from src.services.rag_service import evaluate_index, initialize_rag_system, load_rag_cache
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Build the RAG cache or report ANN index recall/latency.")
+    parser.add_argument("--eval-index", action="store_true", help="recall@k (vs Flat) and p50/p99 latency per index type")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--types", default="flat,ivf_flat,hnsw,ivf_pq")
+    parser.add_argument(
+        "--hash-embeddings",
+        action="store_true",
+        help="build with hash embeddings instead of loading the embedding model (testing only, skips the chunk embedding store)",
+    )
+    args = parser.parse_args()
+
+    if args.eval_index:
+        # 평가 모드는 기존 캐시의 임베딩만 사용. 캐시가 없을 때 빌드하면 (모델 없이) 해시 임베딩으로 측정하게 됨
+        os.environ["RAG_CACHE_MODE"] = "load"
+        if not load_rag_cache(verify_embedding=False):
+            raise SystemExit("No usable RAG cache; run build_rag_index.py first")
+        report = evaluate_index(
+            k=args.k,
+            n_queries=args.queries,
+            index_types=[t.strip() for t in args.types.split(",") if t.strip()],
+        )
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+
     os.environ.setdefault("RAG_CACHE_MODE", "refresh")
+    # 서버와 같은 임베딩 모델로 빌드해야 쿼리 벡터와 맞고, 청크 임베딩 저장소로 바뀐 청크만 다시 인코딩함
+    if not args.hash_embeddings and not initialize_embedding_model():
+        raise SystemExit("Embedding model failed to load (use --hash-embeddings to build without it)")
     ok = initialize_rag_system()
     if not ok:
         raise SystemExit("RAG cache build failed")
@@ -0,0 +1,49 @@
+"""
+gunicorn 설정 (운영 모드)
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+- preload_app: 마스터에서 모델/RAG 인덱스를 한 번 로드한 뒤 워커를 fork
+  (GGUF 가중치는 mmap, numpy/FAISS 인덱스는 copy-on-write로 워커 간 공유)
+- gthread 워커: 워커마다 스레드 여러 개로 동시 요청 처리 (LLM 호출은 워커별 스케줄러가 직렬화)
+- 워커 내부 백그라운드 스레드(LLM 스케줄러, 임베딩 배처 등)는 fork 이후 첫 요청에서 다시 시작됨
+- preload 시 마스터는 기존 RAG 캐시만 로드하고 인덱스를 빌드하지 않음 (fork 전에 torch/OpenMP 연산을 돌리면
+  워커가 멈출 수 있음). 캐시는 python build_rag_index.py 로 미리 만들어 둘 것
+"""
+
+import gc
+import os
+
+from dotenv import load_dotenv
+
+# .env의 GUNICORN_* / MODEL_LOAD_MODE 등이 이 설정 파일에도 적용되도록 먼저 로드
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('PYTHON_PORT', '5001')}"
+workers = int(os.getenv("GUNICORN_WORKERS", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+# CUDA를 마스터에서 초기화한 뒤 fork 하면 워커에서 사용할 수 없으므로 GPU 사용 시 false로 설정
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+if preload_app:
+    # 로딩 스레드는 fork 후 워커로 이어지지 않으므로 마스터에서 로딩을 끝낸 뒤 fork
+    os.environ["MODEL_LOAD_MODE"] = "blocking"
+    # 임베딩 모델 추론(인덱스 빌드)을 fork 전 마스터에서 하지 않도록 캐시 로드만 허용
+    os.environ["RAG_BUILD_ON_START"] = "false"
+# LLM 생성/스트리밍이 길어질 수 있어 기본 타임아웃을 늘림
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    # 로드된 객체를 GC 추적 대상에서 빼서, 워커의 GC가 공유 페이지를 건드려 복사되지 않도록 함
+    if preload_app:
+        gc.freeze()
+    server.log.info(f"Master ready (workers={workers}, threads={threads}, preload={preload_app})")
+
+
+def post_fork(server, worker):
+    server.log.info(f"Worker spawned (pid={worker.pid})")
@@ -0,0 +1,135 @@
+"""
+시작(import) 시간 프로파일
+
+    python profile_startup.py                      # app import 시간 상위 모듈 보고
+    python profile_startup.py --budget-ms 1500     # 총 import 시간이 예산을 넘으면 exit 1
+    python profile_startup.py --json startup.json  # 모듈별 결과를 JSON으로 저장 (회귀 비교용)
+    python profile_startup.py --scenario llm       # GGUF LLM 로드 경로 (torch/transformers를 import 하면 안 됨)
+
+`python -X importtime`으로 새 프로세스에서 대상 모듈을 import 하고 모듈별 self/누적 시간을 집계한다.
+무거운 라이브러리(torch, transformers, sklearn, langgraph 등)는 모델 로딩/첫 사용 시점에 import 하도록
+되어 있으므로, 시작 경로에서 import 되면 위반으로 보고한다.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# 시작 시 import 되면 안 되는 모듈 (최상위 패키지 이름)
+DEFAULT_DEFERRED = "torch,transformers,sentence_transformers,sklearn,langgraph,langchain,langchain_core,chandra,llama_cpp"
+
+# 시나리오별 (실행 코드, 금지 패키지). llm: GGUF LLM만 로드 (모델 파일이 없어도 import 경로는 측정됨)
+SCENARIOS = {
+    "app": ("import app", DEFAULT_DEFERRED),
+    "llm": (
+        "from src.models.model_manager import initialize_llm; initialize_llm()",
+        "torch,transformers,sentence_transformers,sklearn,langgraph,langchain,langchain_core,chandra",
+    ),
+}
+
+
+def run_importtime(code: str):
+    """코드를 -X importtime으로 실행. [(모듈, self_us, cumulative_us, depth)]와 전체 소요 시간(ms)."""
+    env = dict(os.environ, PYTHONIOENCODING="utf-8")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=str(Path(__file__).parent),
+        env=env,
+        capture_output=True,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    wall_ms = (time.perf_counter() - started) * 1000.0
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-4000:])
+        raise SystemExit(f"{code!r} failed (exit {proc.returncode})")
+
+    entries = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        except ValueError:
+            continue
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries, wall_ms
+
+
+def build_report(entries, wall_ms: float, deferred):
+    packages = {}
+    for name, self_us, _, _ in entries:
+        top = name.split(".", 1)[0]
+        packages[top] = packages.get(top, 0) + self_us
+    total_us = sum(cumulative for _, _, cumulative, depth in entries if depth == 0)
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "import_ms": round(total_us / 1000.0, 1),
+        "modules": len(entries),
+        # 최상위 패키지별 self 시간 합 (하위 모듈 포함)
+        "packages_ms": {
+            top: round(us / 1000.0, 1)
+            for top, us in sorted(packages.items(), key=lambda kv: kv[1], reverse=True)
+        },
+        "modules_cumulative_ms": {
+            name: round(cumulative / 1000.0, 1)
+            for name, _, cumulative, _ in sorted(entries, key=lambda e: e[2], reverse=True)
+        },
+        "deferred_violations": sorted(top for top in packages if top in deferred),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-module import time of the server startup path.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="app", help="app: import app / llm: initialize_llm()")
+    parser.add_argument("--target", help="시나리오 대신 import 할 모듈")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "0")),
+        help="총 import 시간 상한 (0이면 검사하지 않음)",
+    )
+    parser.add_argument("--deferred", help="import 되면 안 되는 패키지 (쉼표 구분, 기본: 시나리오별 목록)")
+    parser.add_argument("--json", dest="json_path", help="결과를 JSON 파일로 저장")
+    args = parser.parse_args()
+
+    code, deferred_default = SCENARIOS[args.scenario]
+    if args.target:
+        code = f"import {args.target}"
+    deferred = {name.strip() for name in (args.deferred or deferred_default).split(",") if name.strip()}
+    entries, wall_ms = run_importtime(code)
+    report = build_report(entries, wall_ms, deferred)
+
+    print(f"{code}: {report['import_ms']:.1f} ms (process {report['wall_ms']:.1f} ms, {report['modules']} modules)")
+    print("\nTop packages (self time):")
+    for top, ms in list(report["packages_ms"].items())[: args.top]:
+        print(f"  {ms:9.1f} ms  {top}")
+    print("\nTop modules (cumulative):")
+    for name, ms in list(report["modules_cumulative_ms"].items())[: args.top]:
+        print(f"  {ms:9.1f} ms  {name}")
+
+    if args.json_path:
+        Path(args.json_path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    failed = False
+    if report["deferred_violations"]:
+        print(f"\n❌ Deferred packages imported at startup: {', '.join(report['deferred_violations'])}")
+        failed = True
+    if args.budget_ms and report["import_ms"] > args.budget_ms:
+        print(f"\n❌ Import time {report['import_ms']:.1f} ms exceeds budget {args.budget_ms:.1f} ms")
+        failed = True
+    if failed:
+        raise SystemExit(1)
+    print("\n✅ Startup import budget OK")
+
+
+if __name__ == "__main__":
+    main()
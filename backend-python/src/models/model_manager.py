@@ -1,22 +1,28 @@
 ﻿import os
-import torch
 import numpy as np
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-from transformers import AutoModel, AutoTokenizer
 
+# torch / transformers / sentence-transformers는 import만 수 초가 걸리므로 모델을 로드할 때 가져옴
 _models = {}
 
 
 def initialize_models():
-    """LLM/Embedding 모델 초기화."""
-    global _models
+    """LLM/Embedding 모델 초기화 (순차)."""
+    initialize_llm()
+    initialize_embedding_model()
 
+
+def initialize_llm() -> bool:
+    """GGUF LLM 인스턴스 풀 로드. 성공 여부 반환."""
     # LLM 로드 (GGUF)
     print("📥 Loading LLM Model...")
     try:
         from llama_cpp import Llama
 
+        # GGUF만 쓰는 경로에서는 torch를 import 하지 않고 llama.cpp 빌드의 GPU 오프로드 지원 여부로 판단
+        gpu_offload = _llama_supports_gpu_offload()
+        _models['llm_gpu_offload'] = gpu_offload
+
         backend_root = Path(__file__).parent.parent.parent
         model_filename = 'Meta-Llama-3.1-8B-Instruct-Q4_K_M.gguf'
         model_path = os.getenv('LLM_MODEL_PATH')
@@ -35,38 +41,61 @@ def initialize_models():
         llm_device = os.getenv("LLM_DEVICE", "auto").lower()
         prefer_gpu = llm_device in ("auto", "gpu", "cuda")
 
+        pool_size = max(1, int(os.getenv('LLM_POOL_SIZE', '1')))
+        n_threads = _threads_per_instance(pool_size)
+        n_ctx = int(os.getenv('LLM_N_CTX', '4096'))
+        if pool_size > 1 and prefer_gpu and gpu_offload:
+            # GPU 오프로드 시 인스턴스마다 가중치가 VRAM에 따로 올라감 (mmap 공유는 CPU 메모리에만 해당)
+            print(
+                f"⚠️ LLM_POOL_SIZE={pool_size}: GPU 오프로드 시 인스턴스마다 모델 가중치를 VRAM에 별도로 로드합니다. "
+                "VRAM이 부족하면 LLM_POOL_SIZE=1 또는 LLM_DEVICE=cpu로 설정하세요."
+            )
+
         def _load_llm(n_gpu_layers: int):
+            # use_mmap(기본값): 같은 GGUF 파일을 mmap 하므로 인스턴스끼리 가중치 페이지를 공유
             return Llama(
                 model_path=model_path,
                 n_gpu_layers=n_gpu_layers,
-                n_ctx=4096,
+                n_ctx=n_ctx,
+                n_threads=n_threads,
+                use_mmap=True,
                 max_tokens=512,
                 temperature=0.7,
                 top_p=0.95,
                 verbose=False,
             )
 
-        try:
-            if prefer_gpu and torch.cuda.is_available():
-                _models['llm'] = _load_llm(-1)
-            else:
-                _models['llm'] = _load_llm(0)
-        except Exception:
-            if prefer_gpu and torch.cuda.is_available():
-                print("⚠️ GPU 로딩 실패, CPU로 재시도합니다.")
-                _models['llm'] = _load_llm(0)
-            else:
+        def _load_one():
+            try:
+                if prefer_gpu and gpu_offload:
+                    return _load_llm(-1)
+                return _load_llm(0)
+            except Exception:
+                if prefer_gpu and gpu_offload:
+                    print("⚠️ GPU 로딩 실패, CPU로 재시도합니다.")
+                    return _load_llm(0)
                 raise
+
+        pool = [_load_one() for _ in range(pool_size)]
+        _models['llm_pool'] = pool
+        _models['llm_affinity'] = _cpu_affinity_sets(pool_size, n_threads)
+        _models['llm'] = pool[0]
+        print(f"  LLM pool: {pool_size} instance(s), n_threads={n_threads}, n_ctx={n_ctx}")
         print("✅ LLM Model loaded successfully")
-        print(f"  GPU Available: {torch.cuda.is_available()}")
-        if torch.cuda.is_available():
-            print(f"  GPU: {torch.cuda.get_device_name(0)}")
+        print(f"  GPU offload: {'on' if prefer_gpu and gpu_offload else 'off'} (llama.cpp GPU support: {gpu_offload})")
     except Exception as e:
         import traceback
         print("? Failed to load LLM Model (details below):")
         traceback.print_exc()
         _models['llm'] = None
+        _models['llm_pool'] = []
+        _models['llm_affinity'] = None
+        return False
+    return True
+
 
+def initialize_embedding_model() -> bool:
+    """임베딩 모델 로드 (실패 시 sentence-transformers 소형 모델로 폴백). 성공 여부 반환."""
     # 임베딩 모델 로드 (기본: Qwen/Qwen3-Embedding-0.6B, GPU float16)
     print("📥 Loading Embedding Model...")
     embedding_name = (
@@ -75,10 +104,22 @@ def initialize_models():
         or 'Qwen/Qwen3-Embedding-0.6B'
     )
     embedding_device_pref = os.getenv('EMBEDDING_DEVICE', 'auto')  # auto|cuda|cpu
+    embedding_batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+    embedding_max_length = int(os.getenv('EMBEDDING_MAX_LENGTH', '512'))
+    embedding_pooling = os.getenv('EMBEDDING_POOLING', 'auto').lower()  # auto|mean|last_token
+
+    import torch
+
+    # /info 등에서 쓰는 장치 정보를 시작 시 한 번 확인해 둠 (torch는 어차피 여기서 import)
+    get_device_info()
 
     class HFEmbeddingModel:
         def __init__(self, model_id: str):
             self.model_id = model_id
+            self.batch_size = embedding_batch_size
+            self.max_length = embedding_max_length
+            self.pooling = _resolve_pooling(model_id, embedding_pooling)
+            from transformers import AutoModel, AutoTokenizer
             try:
                 self.tokenizer = AutoTokenizer.from_pretrained(
                     model_id,
@@ -91,6 +132,9 @@ def initialize_models():
                     model_id,
                     local_files_only=False
                 )
+            # 배치 패딩을 위해 pad 토큰이 없으면 eos 토큰을 사용
+            if self.tokenizer.pad_token is None and self.tokenizer.eos_token is not None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
 
             device_map = "cuda" if embedding_device_pref == "cuda" or (embedding_device_pref == "auto" and torch.cuda.is_available()) else "cpu"
             dtype = torch.float16 if device_map == "cuda" else torch.float32
@@ -126,20 +170,41 @@ def initialize_models():
                     )
                     self.device = self.model.device
 
-        def encode(self, texts, convert_to_numpy=True, show_progress_bar=False):
+        def _pool(self, hidden, attention_mask):
+            if self.pooling == "last_token":
+                # 왼쪽 패딩이면 마지막 위치, 오른쪽 패딩이면 각 시퀀스의 마지막 실제 토큰
+                if bool(attention_mask[:, -1].all()):
+                    return hidden[:, -1]
+                last = attention_mask.sum(dim=1) - 1
+                return hidden[torch.arange(hidden.size(0), device=hidden.device), last]
+            # 패딩 토큰을 제외한 mean pooling
+            mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+            return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+        def encode(self, texts, batch_size=None, convert_to_numpy=True, show_progress_bar=False):
             if isinstance(texts, str):
                 texts = [texts]
-            vectors = []
+            texts = list(texts)
+            if not texts:
+                return np.empty((0, 0), dtype=np.float32) if convert_to_numpy else torch.empty(0)
+            batch_size = max(1, int(batch_size or self.batch_size))
+
+            # 전체를 한 번에 토크나이즈한 뒤 길이순으로 정렬해 배치별 패딩을 최소화
+            encoded = self.tokenizer(texts, truncation=True, max_length=self.max_length)
+            lengths = [len(ids) for ids in encoded["input_ids"]]
+            order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)
+
+            vectors = [None] * len(texts)
             with torch.no_grad():
-                for t in texts:
-                    inputs = self.tokenizer(t, return_tensors="pt", truncation=True, padding=True)
+                for start in range(0, len(order), batch_size):
+                    batch_idx = order[start:start + batch_size]
+                    features = [{k: encoded[k][i] for k in encoded.keys()} for i in batch_idx]
+                    inputs = self.tokenizer.pad(features, padding=True, return_tensors="pt")
                     inputs = {k: v.to(self.model.device) for k, v in inputs.items()}
                     outputs = self.model(**inputs)
-                    emb = outputs.last_hidden_state.mean(dim=1)  # mean pooling
-                    if convert_to_numpy:
-                        vectors.append(emb.squeeze(0).cpu().numpy())
-                    else:
-                        vectors.append(emb.squeeze(0))
+                    emb = self._pool(outputs.last_hidden_state, inputs["attention_mask"])
+                    for row, i in enumerate(batch_idx):
+                        vectors[i] = emb[row].float().cpu().numpy() if convert_to_numpy else emb[row]
             if convert_to_numpy:
                 # numpy 배열로 변환하여 반환 (sentence-transformers와 동일한 형식)
                 return np.vstack(vectors)
@@ -147,29 +212,149 @@ def initialize_models():
 
     try:
         _models['embedding'] = HFEmbeddingModel(embedding_name)
-        print(f"✅ Embedding Model loaded: {embedding_name} (device: {_models['embedding'].model.device})")
+        _models['embedding_name'] = embedding_name
+        _models['embedding_kind'] = 'hf'
+        print(f"✅ Embedding Model loaded: {embedding_name} (device: {_models['embedding'].model.device}, pooling: {_models['embedding'].pooling})")
+        return True
     except Exception as e:
         print(f"🚧 Failed to load embedding model ({embedding_name}): {e}")
         print("   Falling back to sentence-transformers/all-MiniLM-L6-v2...")
         try:
+            from sentence_transformers import SentenceTransformer
             _models['embedding'] = SentenceTransformer(
                 'sentence-transformers/all-MiniLM-L6-v2',
                 cache_folder='./models/embeddings',
                 local_files_only=False,
             )
+            _models['embedding_name'] = 'sentence-transformers/all-MiniLM-L6-v2'
+            _models['embedding_kind'] = 'sentence_transformers'
             print("✅ Embedding Model loaded: all-MiniLM-L6-v2")
+            return True
         except Exception as e2:
             print(f"❌ Embedding model unavailable: {e2}")
             _models['embedding'] = None
+            return False
+
+
+def _threads_per_instance(pool_size: int) -> int:
+    env = os.getenv('LLM_THREADS_PER_INSTANCE')
+    if env:
+        return max(1, int(env))
+    # llama.cpp 기본값과 같이 논리 CPU의 절반(SMT 환경의 물리 코어 수 근사)을 인스턴스끼리 나눔
+    return max(1, ((os.cpu_count() or 1) // 2) // pool_size)
+
+
+def _parse_cpu_list(spec: str):
+    cpus = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            lo, hi = part.split('-', 1)
+            cpus.update(range(int(lo), int(hi) + 1))
+        else:
+            cpus.add(int(part))
+    return cpus
+
+
+def _cpu_affinity_sets(pool_size: int, n_threads: int):
+    """
+    LLM_CPU_AFFINITY
+      - 미지정: 고정하지 않음
+      - auto : CPU를 인스턴스별 n_threads개씩 연속 구간으로 나눔
+      - 직접 : "0-7;8-15" 처럼 인스턴스별 CPU 목록을 ';'로 구분
+    """
+    spec = os.getenv('LLM_CPU_AFFINITY', '').strip()
+    if not spec or not hasattr(os, 'sched_setaffinity'):
+        return None
+    if spec.lower() == 'auto':
+        total = os.cpu_count() or 1
+        return [
+            set(range(i * n_threads, min(total, (i + 1) * n_threads))) or set(range(total))
+            for i in range(pool_size)
+        ]
+    sets = [_parse_cpu_list(part) for part in spec.split(';') if part.strip()]
+    if len(sets) < pool_size:
+        print(f"⚠️ LLM_CPU_AFFINITY 항목 수({len(sets)})가 풀 크기({pool_size})보다 적어 나머지는 고정하지 않습니다.")
+    return [sets[i] if i < len(sets) else None for i in range(pool_size)]
+
+
+def _resolve_pooling(model_id: str, pooling: str) -> str:
+    """EMBEDDING_POOLING=auto이면 모델에 맞는 풀링 선택 (Qwen3-Embedding은 last-token)."""
+    if pooling in ("mean", "last_token"):
+        return pooling
+    if "qwen3-embedding" in model_id.lower():
+        return "last_token"
+    return "mean"
+
+
+def get_embedding_signature():
+    """임베딩 벡터를 결정하는 설정 (모델/풀링/토큰 상한). 캐시 호환성 확인에 사용."""
+    model = _models.get('embedding')
+    if model is None:
+        return None
+    model_id = _models.get('embedding_name')
+    if _models.get('embedding_kind') == 'sentence_transformers':
+        return {
+            'model': model_id,
+            'pooling': 'sentence_transformers',
+            'max_length': getattr(model, 'max_seq_length', None),
+        }
+    return {
+        'model': model_id,
+        'pooling': getattr(model, 'pooling', 'mean'),
+        'max_length': getattr(model, 'max_length', None),
+    }
 
 
 def get_llm_model():
     return _models.get('llm')
 
 
+def get_llm_pool():
+    """LLM 인스턴스 목록 (LLM_POOL_SIZE개). 로드 실패 시 빈 리스트."""
+    return _models.get('llm_pool') or []
+
+
+def get_llm_affinity(instance_id: int):
+    sets = _models.get('llm_affinity')
+    if not sets or instance_id >= len(sets):
+        return None
+    return sets[instance_id]
+
+
 def get_embedding_model():
     return _models.get('embedding')
 
 
+def _llama_supports_gpu_offload() -> bool:
+    """llama-cpp-python이 CUDA/Metal 등 GPU 오프로드를 지원하도록 빌드됐는지."""
+    try:
+        import llama_cpp
+
+        return bool(llama_cpp.llama_supports_gpu_offload())
+    except Exception:
+        return False
+
+
+def get_device_info():
+    """
+    CUDA 사용 가능 여부/GPU 이름. 처음 호출(시작 시 임베딩 모델 로드 또는 /info)에서 한 번만 확인하고 캐시.
+    torch가 없으면 cpu로 간주. LLM의 GPU 사용 여부는 llm_gpu_offload (torch 없이 llama.cpp로 확인).
+    """
+    info = _models.get('device_info')
+    if info is None:
+        try:
+            import torch
+            cuda = bool(torch.cuda.is_available())
+            gpu_name = torch.cuda.get_device_name(0) if cuda else None
+        except Exception:
+            cuda, gpu_name = False, None
+        info = {'device': 'cuda' if cuda else 'cpu', 'cuda': cuda, 'gpu_name': gpu_name}
+        _models['device_info'] = info
+    return dict(info, llm_gpu_offload=_models.get('llm_gpu_offload'))
+
+
 def is_gpu_available():
-    return torch.cuda.is_available()
+    return get_device_info()['cuda']
@@ -1,12 +1,31 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, make_response, request, jsonify, stream_with_context
+import functools
+import json
 import logging
+import os
 import time
+import uuid
 from datetime import datetime
-from src.services.llm_service import generate_response, get_keyword_response
-from src.services.rag_service import generate_rag_response, is_rag_initialized
+from src.services.llm_service import analyze_prompt, generate_response, get_keyword_response, stream_response
+from src.services.inference_scheduler import (
+    PRIORITY_BATCH,
+    DeadlineExceededError,
+    SchedulerBusyError,
+    get_inference_scheduler,
+)
+from src.services.rag_service import (
+    generate_rag_response,
+    generate_rag_response_many,
+    is_rag_initialized,
+    retrieve_documents,
+    retrieve_documents_many,
+    stream_rag_response,
+)
+from src.services import tracing
+from src.services.readiness import get_readiness, is_warming_up
 try:
-    from src.services.langgraph_service import invoke_graph
-    LANGGRAPH_AVAILABLE = True
+    from src.services.langgraph_service import invoke_graph, is_langgraph_available
+    LANGGRAPH_AVAILABLE = is_langgraph_available()
 except Exception:
     invoke_graph = None
     LANGGRAPH_AVAILABLE = False
@@ -14,17 +33,56 @@ except Exception:
 generate_bp = Blueprint('generate', __name__)
 logger = logging.getLogger(__name__)
 
-# Agent 모듈은 선택적으로 사용 (오류 발생 시 서버 다운 방지)
-AGENT_AVAILABLE = False
-try:
-    from src.services.agent import invoke_agent, initialize_agent
-    if initialize_agent():
-        AGENT_AVAILABLE = True
-        logger.info("Agent module loaded successfully")
-except Exception as e:
-    logger.warning(f"⚠️ Agent module not available (will use fallback): {e}")
+# Agent 모듈(src.services.agent)은 라우트에서 사용하지 않으므로 시작 시 import/그래프 컴파일을 하지 않음
+
+def _busy_response(error, language='ko'):
+    """LLM 큐 포화/대기 시간 초과 시 503 + Retry-After."""
+    retry_after = getattr(error, 'retry_after', 1)
+    msg = (
+        "요청이 많아 잠시 후 다시 시도해 주세요."
+        if language == 'ko'
+        else "The server is busy. Please try again shortly."
+    )
+    resp = jsonify({'error': 'busy', 'response': msg, 'retry_after': retry_after, 'language': language})
+    resp.status_code = 503
+    resp.headers['Retry-After'] = str(retry_after)
+    return resp
+
+
+def _traced_route(name):
+    """요청 전체를 트레이스 루트 구간으로 측정하고 X-Trace-Id 헤더로 trace_id 전달."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with tracing.trace(name, trace_id=request.headers.get('X-Trace-Id')) as extra:
+                resp = make_response(view(*args, **kwargs))
+                extra['status'] = resp.status_code
+                resp.headers['X-Trace-Id'] = tracing.current_trace_id()
+                return resp
+        return wrapper
+    return decorator
+
+
+def _loading_response(language='ko'):
+    """모델/인덱스 로딩 중 (키워드 응답이 없는 요청) 503 + Retry-After."""
+    msg = (
+        "모델을 불러오는 중입니다. 잠시 후 다시 시도해 주세요."
+        if language == 'ko'
+        else "Models are still loading. Please try again shortly."
+    )
+    resp = jsonify({
+        'error': 'loading',
+        'response': msg,
+        'language': language,
+        'components': get_readiness()['components'],
+    })
+    resp.status_code = 503
+    resp.headers['Retry-After'] = os.getenv('LOADING_RETRY_AFTER', '10')
+    return resp
+
 
 @generate_bp.route('/', methods=['POST'])
+@_traced_route('http.generate')
 def generate():
     """
     텍스트 생성 엔드포인트 (RAG + Agent 기반)
@@ -44,7 +102,9 @@ def generate():
         "tokens_used": 123,
         "model": "LLM",
         "language": "ko",
-        "source": "rag_llm" 또는 "keyword" 또는 "llm"
+        "source": "rag_llm" 또는 "keyword" 또는 "llm",
+        "cache_hit": false,  # 응답 캐시에서 반환되었는지
+        "cache_type": "exact" 또는 "semantic" (cache_hit일 때)
     }
     """
     try:
@@ -69,6 +129,15 @@ def generate():
         print(f"  lang   : {language}")
         print("=" * 60)
 
+        # 모델 로딩 중에는 키워드 응답만 제공
+        if is_warming_up():
+            keyword_resp = analyze_prompt(prompt, language).keyword_hit()
+            if not keyword_resp:
+                return _loading_response(language)
+            keyword_resp['user_id'] = user_id
+            keyword_resp['cache_hit'] = False
+            return jsonify(keyword_resp), 200
+
         # RAG 초기화 확인
         rag_initialized = is_rag_initialized()
         logger.info(f"RAG initialized: {rag_initialized}")
@@ -96,7 +165,8 @@ def generate():
                     temperature=temperature,
                 )
             else:
-                keyword_resp = get_keyword_response(prompt, language)
+                analysis = analyze_prompt(prompt, language)
+                keyword_resp = analysis.keyword_hit()
                 if keyword_resp:
                     keyword_resp["user_id"] = user_id
                     response = keyword_resp
@@ -111,11 +181,14 @@ def generate():
                         max_tokens=max_tokens,
                         temperature=temperature,
                         language=language,
+                        analysis=analysis,
                     )
 
+        response.setdefault('cache_hit', False)
         elapsed = time.time() - start_time
         print("\n[Response] done")
         print(f"  source : {response.get('source', 'unknown')}")
+        print(f"  cache  : {'hit' if response.get('cache_hit') else 'miss'}")
         print(f"  tokens : {response.get('tokens_used', 0)}")
         print(f"  docs   : {len(response.get('documents', []))}")
         print(f"  time   : {elapsed:.2f}s")
@@ -126,6 +199,9 @@ def generate():
             print("... (truncated)")
         print("=" * 60 + "\n")
         return jsonify(response), 200        
+    except (SchedulerBusyError, DeadlineExceededError) as e:
+        logger.warning(f"LLM scheduler rejected request: {e}")
+        return _busy_response(e, data.get('language', 'ko') if data else 'ko')
     except Exception as e:
         # 에러 로깅
         print("\n" + "="*60)
@@ -144,3 +220,178 @@ def generate():
             'error': str(e),
             'language': lang
         }), 500
+
+
+@generate_bp.route('/batch', methods=['POST'])
+@_traced_route('http.generate_batch')
+def generate_batch():
+    """
+    배치 생성 엔드포인트 (오프라인 평가 / FAQ 사전 생성용)
+
+    Request:
+    {
+        "prompts": ["질문1", "질문2", ...],
+        "language": "ko" 또는 "en",
+        "k": 3,
+        "retrieve_only": false,
+        "user_id": "사용자ID (선택사항)"
+    }
+
+    Response:
+    {
+        "results": [ {"prompt": ..., "response": ..., "source": ...}, ... ],  # 요청 순서 유지
+                   # LLM 큐에서 거절된 항목: {"prompt": ..., "error": "busy", "retry_after": n}
+                   # (모든 항목이 처리되지 못한 경우에만 전체 503)
+        "count": 2,
+        "elapsed": 1.23
+    }
+    """
+    try:
+        data = request.get_json(force=True) or {}
+        prompts = data.get('prompts') or []
+        language = data.get('language', 'ko')
+        user_id = data.get('user_id', 'default')
+        k = int(data.get('k', 3))
+        retrieve_only = bool(data.get('retrieve_only', False))
+        max_batch = int(os.getenv('GENERATE_BATCH_MAX', '256'))
+
+        if not isinstance(prompts, list) or not prompts:
+            return jsonify({'error': 'prompts (list) is required'}), 400
+        if len(prompts) > max_batch:
+            return jsonify({'error': f'too many prompts (max {max_batch})'}), 400
+
+        start_time = time.time()
+        print(f"\n[Batch Request] {len(prompts)} prompts (lang={language}, retrieve_only={retrieve_only})")
+
+        results = [None] * len(prompts)
+        pending = []
+        warming_up = is_warming_up()
+        for i, prompt in enumerate(prompts):
+            prompt = str(prompt or '')
+            if not prompt:
+                results[i] = {'prompt': prompt, 'error': 'prompt is required'}
+                continue
+            if not retrieve_only:
+                keyword_resp = get_keyword_response(prompt, language)
+                if keyword_resp:
+                    results[i] = dict(keyword_resp, prompt=prompt, user_id=user_id)
+                    continue
+            if warming_up:
+                results[i] = {'prompt': prompt, 'error': 'loading'}
+                continue
+            pending.append(i)
+
+        if pending:
+            queries = [prompts[i] for i in pending]
+            if retrieve_only:
+                for i, docs in zip(pending, retrieve_documents_many(queries, k=k)):
+                    results[i] = {'prompt': prompts[i], 'documents': docs, 'source': 'retrieval'}
+            elif is_rag_initialized():
+                for i, resp in zip(pending, generate_rag_response_many(queries, language=language, k=k)):
+                    if 'error' not in resp:
+                        resp['tokens_used'] = resp.get('tokens_used', 0)
+                    results[i] = dict(resp, prompt=prompts[i], user_id=user_id)
+            else:
+                for i in pending:
+                    try:
+                        resp = generate_response(
+                            prompt=prompts[i],
+                            user_id=user_id,
+                            max_tokens=data.get('max_tokens', 256),
+                            temperature=data.get('temperature', 0.7),
+                            language=language,
+                            priority=PRIORITY_BATCH,
+                        )
+                    except (SchedulerBusyError, DeadlineExceededError) as e:
+                        # 한 항목이 거절돼도 이미 처리한 결과는 버리지 않음
+                        resp = {'error': 'busy', 'retry_after': e.retry_after}
+                    results[i] = dict(resp, prompt=prompts[i])
+
+        busy = [r for r in results if r.get('error') == 'busy']
+        if busy and all('error' in r for r in results):
+            # 처리된 항목이 하나도 없으면 배치 전체를 503으로 응답
+            retry_after = max(r.get('retry_after', 1) for r in busy)
+            logger.warning(f"LLM scheduler rejected every batch item (retry after {retry_after}s)")
+            return _busy_response(DeadlineExceededError(retry_after), language)
+
+        elapsed = time.time() - start_time
+        print(f"[Batch Response] {len(prompts)} results in {elapsed:.2f}s")
+        return jsonify({'results': results, 'count': len(results), 'elapsed': round(elapsed, 3)}), 200
+
+    except (SchedulerBusyError, DeadlineExceededError) as e:
+        logger.warning(f"LLM scheduler rejected batch: {e}")
+        return _busy_response(e, language)
+    except Exception as e:
+        logger.error(f"Batch generation error: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+def _sse(events):
+    for event in events:
+        payload = json.dumps(event["data"], ensure_ascii=False)
+        yield f"event: {event['event']}\ndata: {payload}\n\n"
+
+
+@generate_bp.route('/stream', methods=['POST'])
+def generate_stream():
+    """
+    스트리밍 생성 엔드포인트 (Server-Sent Events)
+
+    Request: /generate 와 동일
+
+    Response (text/event-stream):
+        event: documents  data: {"documents": [...]}          # 검색 문서를 먼저 전송
+        event: token      data: {"text": "..."}               # 생성되는 대로 전송
+        event: done       data: {"source": ..., "tokens_used": ..., "ttft_ms": ..., "elapsed_ms": ...}
+    """
+    data = request.get_json(force=True) or {}
+    prompt = data.get('prompt', '')
+    user_id = data.get('user_id', 'default')
+    max_tokens = data.get('max_tokens', 256)
+    temperature = data.get('temperature', 0.7)
+    language = data.get('language', 'ko')
+    button_request = data.get('source', 'text') == 'button'
+
+    if not prompt:
+        return jsonify({'error': 'prompt is required'}), 400
+    if is_warming_up() and not analyze_prompt(prompt, language).keyword_response:
+        return _loading_response(language)
+    scheduler = get_inference_scheduler()
+    if scheduler.is_full():
+        return _busy_response(SchedulerBusyError(scheduler.estimate_retry_after()), language)
+
+    trace_id = request.headers.get('X-Trace-Id') or uuid.uuid4().hex[:16]
+
+    def events():
+        try:
+            # 응답 본문은 뷰 함수가 끝난 뒤 생성되므로 트레이스도 제너레이터 안에서 시작
+            with tracing.trace('http.generate_stream', trace_id=trace_id):
+                # 키워드 → RAG → LLM 순서 (문서가 없으면 LLM으로 폴백)
+                analysis = analyze_prompt(prompt, language)
+                if not button_request and is_rag_initialized() and not analysis.keyword_response:
+                    docs = retrieve_documents(prompt, k=3)
+                    if docs:
+                        for event in stream_rag_response(prompt, language=language, documents=docs):
+                            if event["event"] == "done":
+                                event["data"]["user_id"] = user_id
+                            yield event
+                        return
+                yield from stream_response(
+                    prompt=prompt,
+                    user_id=user_id,
+                    max_tokens=max_tokens,
+                    temperature=temperature,
+                    language=language,
+                    analysis=analysis,
+                )
+        except (SchedulerBusyError, DeadlineExceededError) as e:
+            yield {"event": "error", "data": {"error": "busy", "retry_after": e.retry_after, "language": language}}
+        except Exception as e:
+            logger.error(f"Streaming generation error: {e}", exc_info=True)
+            yield {"event": "error", "data": {"error": str(e), "language": language}}
+
+    return Response(
+        stream_with_context(_sse(events())),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', 'X-Trace-Id': trace_id},
+    )
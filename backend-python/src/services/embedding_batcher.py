@@ -0,0 +1,152 @@
+"""
+쿼리 임베딩 마이크로 배칭
+
+- 여러 요청 스레드의 단일 문장 encode를 짧은 시간(window) 동안 모아 한 번의 배치로 실행
+- 각 호출자는 Future로 자신의 벡터를 돌려받음
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """요청 간 쿼리 임베딩을 모아 배치로 실행하는 스케줄러."""
+
+    def __init__(self, window_ms: float = 5.0, max_batch_size: int = 16):
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+        self._stats = {
+            "requests": 0,
+            "batches": 0,
+            "batched_items": 0,
+            "max_batch_size_seen": 0,
+            "max_queue_depth": 0,
+            "errors": 0,
+        }
+
+    def _ensure_worker(self) -> None:
+        # fork 이후 자식 프로세스에는 스레드가 없으므로 pid 기준으로 다시 띄움
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == pid and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        """단일 텍스트 임베딩 요청. 결과는 1차원 ndarray."""
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        with self._lock:
+            self._stats["requests"] += 1
+            depth = self._queue.qsize()
+            if depth > self._stats["max_queue_depth"]:
+                self._stats["max_queue_depth"] = depth
+        return future
+
+    def encode(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """여러 텍스트를 제출하고 입력 순서대로 (n, dim) 행렬 반환."""
+        futures = [self.submit(t) for t in texts]
+        return np.vstack([f.result(timeout=timeout) for f in futures])
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch: List[tuple]) -> None:
+        from src.models.model_manager import get_embedding_model
+
+        texts = [text for text, _ in batch]
+        futures = [future for _, future in batch]
+        try:
+            model = get_embedding_model()
+            if model is None:
+                raise RuntimeError("Embedding model not loaded")
+            vectors = model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+            if isinstance(vectors, list):
+                vectors = np.vstack(vectors)
+            for row, future in enumerate(futures):
+                future.set_result(np.asarray(vectors[row]))
+        except Exception as e:
+            logger.warning(f"Batched embedding failed ({len(batch)} items): {e}")
+            with self._lock:
+                self._stats["errors"] += 1
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["batched_items"] += len(batch)
+            if len(batch) > self._stats["max_batch_size_seen"]:
+                self._stats["max_batch_size_seen"] = len(batch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        stats["queue_depth"] = self._queue.qsize()
+        stats["avg_batch_size"] = round(stats["batched_items"] / batches, 3) if batches else 0.0
+        stats["avg_batch_fill"] = (
+            round(stats["batched_items"] / (batches * self.max_batch_size), 3) if batches else 0.0
+        )
+        stats["window_ms"] = self.window * 1000.0
+        stats["max_batch_size"] = self.max_batch_size
+        return stats
+
+
+_batcher: Optional[EmbeddingBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def is_batching_enabled() -> bool:
+    return os.getenv("EMBED_BATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def get_embedding_batcher() -> EmbeddingBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = EmbeddingBatcher(
+                    window_ms=float(os.getenv("EMBED_BATCH_WINDOW_MS", "5")),
+                    max_batch_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", "16")),
+                )
+    return _batcher
+
+
+def get_batcher_stats() -> Dict[str, Any]:
+    if _batcher is None:
+        return {"enabled": is_batching_enabled(), "requests": 0}
+    stats = _batcher.get_stats()
+    stats["enabled"] = is_batching_enabled()
+    return stats
@@ -1,10 +1,8 @@
 ﻿import logging
 import re
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
 import numpy as np
-from sklearn.decomposition import PCA
-from sklearn.metrics.pairwise import cosine_similarity
 
 from src.models.model_manager import get_embedding_model
 
@@ -59,6 +57,9 @@ def reduce_dimension(embeddings: np.ndarray, target_dim: int = 256) -> np.ndarra
     max_components = min(n_samples, n_features)
     if target_dim >= max_components:
         return embeddings
+    # sklearn은 import 비용이 커서 차원 축소를 할 때만 가져옴
+    from sklearn.decomposition import PCA
+
     pca = PCA(n_components=target_dim, random_state=42)
     return pca.fit_transform(embeddings)
 
@@ -113,18 +114,55 @@ def generate_embeddings(
     }
 
 
+# 한 번에 만드는 (쿼리 x 문서) 점수 행렬 원소 수 상한 (float32 기준 약 64MB)
+_MAX_SCORE_ELEMENTS = 16 * 1024 * 1024
+
+
+def topk_inner_product(db: np.ndarray, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    정규화된 문서 행렬에서 쿼리별 내적 상위 k개 검색 (argpartition, float32).
+
+    queries는 (dim,) 또는 (nq, dim). 반환: (scores, indices) 모두 (nq, k), 점수 내림차순.
+    """
+    db = np.asarray(db, dtype=np.float32)
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    nq = queries.shape[0]
+    n = db.shape[0] if db.ndim == 2 else 0
+    k = min(int(k), n)
+    if k <= 0 or nq == 0:
+        return np.empty((nq, 0), dtype=np.float32), np.empty((nq, 0), dtype=np.int64)
+
+    out_scores = np.empty((nq, k), dtype=np.float32)
+    out_idx = np.empty((nq, k), dtype=np.int64)
+    block = max(1, _MAX_SCORE_ELEMENTS // n)
+    for start in range(0, nq, block):
+        scores = queries[start:start + block] @ db.T
+        if k < n:
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(n), scores.shape)
+        part_scores = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-part_scores, axis=1, kind="stable")
+        out_idx[start:start + block] = np.take_along_axis(part, order, axis=1)
+        out_scores[start:start + block] = np.take_along_axis(part_scores, order, axis=1)
+    return out_scores, out_idx
+
+
+def _l2_normalize(mat: np.ndarray) -> np.ndarray:
+    return mat / (np.linalg.norm(mat, axis=-1, keepdims=True) + 1e-10)
+
+
 def similarity_search(query_embedding: list, embeddings_db: list, top_k: int = 5):
     """코사인 유사도로 상위 문서 검색."""
-    query_vec = np.array(query_embedding).reshape(1, -1)
-    db_vecs = np.array(embeddings_db)
+    query_vec = _l2_normalize(np.asarray(query_embedding, dtype=np.float32).reshape(1, -1))
+    db_vecs = _l2_normalize(np.asarray(embeddings_db, dtype=np.float32))
 
-    similarities = cosine_similarity(query_vec, db_vecs)[0]
-    top_indices = np.argsort(similarities)[::-1][:top_k]
+    scores, indices = topk_inner_product(db_vecs, query_vec, top_k)
 
     return [
         {
             "index": int(idx),
-            "similarity": float(similarities[idx])
+            "similarity": float(score)
         }
-        for idx in top_indices
+        for score, idx in zip(scores[0], indices[0])
     ]
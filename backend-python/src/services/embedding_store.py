@@ -0,0 +1,137 @@
+"""
+청크 임베딩 영구 저장소 (content-addressed)
+
+- 키: sha256(임베딩 설정 + 청크 텍스트)
+- 값: PCA 이전의 원본 임베딩 벡터 (float32)
+- 인덱스 재구축 시 바뀐 청크만 다시 인코딩하기 위해 사용
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_SQL_BATCH = 500
+
+
+def signature_hash(signature: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(signature, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def chunk_key(sig_hash: str, text: str) -> str:
+    return hashlib.sha256(f"{sig_hash}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddingStore:
+    """SQLite 기반 청크 임베딩 저장소."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " signature TEXT NOT NULL,"
+            " dim INTEGER NOT NULL,"
+            " vec BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_signature ON embeddings(signature)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique), _SQL_BATCH):
+                part = unique[start:start + _SQL_BATCH]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, dim, vec FROM embeddings WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, dim, blob in rows:
+                    vec = np.frombuffer(blob, dtype=np.float32)
+                    if vec.shape[0] == dim:
+                        found[key] = vec
+        return found
+
+    def put_many(self, sig_hash: str, items: Iterable[Tuple[str, np.ndarray]]) -> None:
+        rows = []
+        for key, vec in items:
+            vec = np.ascontiguousarray(vec, dtype=np.float32)
+            rows.append((key, sig_hash, int(vec.shape[0]), vec.tobytes()))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, signature, dim, vec) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def prune(self, sig_hash: str, keep_keys: Iterable[str]) -> int:
+        """같은 설정으로 저장된 항목 중 현재 코퍼스에 없는 청크 삭제."""
+        with self._lock:
+            self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_keys (key TEXT PRIMARY KEY)")
+            self._conn.execute("DELETE FROM keep_keys")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO keep_keys (key) VALUES (?)", ((k,) for k in keep_keys)
+            )
+            cur = self._conn.execute(
+                "DELETE FROM embeddings WHERE signature = ? AND key NOT IN (SELECT key FROM keep_keys)",
+                (sig_hash,),
+            )
+            self._conn.execute("DELETE FROM keep_keys")
+            self._conn.commit()
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def encode_with_store(
+    embedding_model,
+    chunks: List[str],
+    signature: Optional[Dict[str, Any]],
+    store_path: Path,
+) -> np.ndarray:
+    """저장소에 있는 청크는 재사용하고, 없는 청크만 인코딩해 원래 순서의 행렬 반환."""
+    if signature is None:
+        emb = embedding_model.encode(chunks, convert_to_numpy=True, show_progress_bar=False)
+        return np.vstack(emb) if isinstance(emb, list) else emb
+
+    sig_hash = signature_hash(signature)
+    keys = [chunk_key(sig_hash, c) for c in chunks]
+    store = ChunkEmbeddingStore(store_path)
+    try:
+        cached = store.get_many(keys)
+        miss_positions: Dict[str, int] = {}
+        for pos, key in enumerate(keys):
+            if key not in cached and key not in miss_positions:
+                miss_positions[key] = pos
+        print(f"     - 임베딩 캐시: 적중 {len(set(keys)) - len(miss_positions)}개, 신규 인코딩 {len(miss_positions)}개")
+
+        if miss_positions:
+            miss_texts = [chunks[pos] for pos in miss_positions.values()]
+            new_emb = embedding_model.encode(miss_texts, convert_to_numpy=True, show_progress_bar=False)
+            if isinstance(new_emb, list):
+                new_emb = np.vstack(new_emb)
+            new_emb = np.asarray(new_emb, dtype=np.float32)
+            new_items = list(zip(miss_positions.keys(), new_emb))
+            store.put_many(sig_hash, new_items)
+            cached.update(new_items)
+
+        removed = store.prune(sig_hash, keys)
+        if removed:
+            logger.info(f"Pruned {removed} stale chunk embeddings")
+        return np.vstack([cached[key] for key in keys]).astype(np.float32)
+    finally:
+        store.close()
@@ -0,0 +1,490 @@
+"""
+LLM 추론 스케줄러
+
+- llama.cpp 인스턴스마다 워커 스레드 하나 (요청 스레드가 동시에 같은 모델을 호출하지 않음)
+- 워커들이 하나의 큐를 공유하므로 비어 있는 인스턴스가 다음 요청을 가져감 (least-loaded)
+- 크기 제한 우선순위 큐 (같은 우선순위는 FIFO), 가득 차면 즉시 SchedulerBusyError
+- 요청별 deadline: 시작 전에 deadline이 지나면 실행하지 않고 DeadlineExceededError
+- 고정 프롬프트 prefix(시스템 프롬프트/RAG 템플릿 앞부분)의 KV 상태를 인스턴스별로 저장해 두고 복원
+  (llama.cpp가 이전 입력과의 공통 prefix 토큰은 다시 평가하지 않으므로 문맥/질문 토큰만 평가)
+- 큐 대기 시간 / 생성 시간 / 인스턴스별 사용률 메트릭
+- 요청별 큐 대기 / 프롬프트 평가(첫 토큰까지) / 토큰 생성 시간을 호출 측 트레이스에 기록
+"""
+
+import hashlib
+import itertools
+import logging
+import math
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from src.services import tracing
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_STREAM_END = object()
+
+
+class SchedulerBusyError(Exception):
+    """큐가 가득 차서 요청을 받을 수 없음 (HTTP 503 + Retry-After)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(Exception):
+    """deadline 안에 추론이 시작되지 못함."""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("LLM request deadline exceeded while queued")
+        self.retry_after = retry_after
+
+
+class _Job:
+    def __init__(
+        self,
+        prompt: str,
+        sampling: Dict[str, Any],
+        stream: bool,
+        deadline: Optional[float],
+        prefix: Optional[str] = None,
+    ):
+        self.prompt = prompt
+        self.prefix = prefix
+        self.sampling = sampling
+        self.stream = stream
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.started = threading.Event()
+        self.cancelled = False
+        self.expired = False
+        self.future: Future = Future()
+        self.chunks: "queue.Queue[Any]" = queue.Queue()
+        # 워커가 채우는 시각 (time.monotonic)
+        self.dequeued_at: Optional[float] = None
+        self.first_token_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.n_tokens = 0
+
+
+class InferenceScheduler:
+    """모델을 소유한 워커 스레드가 큐에서 요청을 꺼내 순서대로 실행."""
+
+    def __init__(
+        self,
+        get_model: Callable[[], Any],
+        max_queue: int = 16,
+        queue_timeout: float = 60.0,
+        get_pool: Optional[Callable[[], List[Any]]] = None,
+        get_affinity: Optional[Callable[[int], Any]] = None,
+        prefix_cache_size: int = 4,
+    ):
+        self._get_model = get_model
+        self._get_pool = get_pool
+        self._get_affinity = get_affinity
+        self.max_queue = max(1, max_queue)
+        self.queue_timeout = queue_timeout
+        self._queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._workers: List[threading.Thread] = []
+        self._pid: Optional[int] = None
+        self._queue_waits: Deque[float] = deque(maxlen=1000)
+        self._gen_times: Deque[float] = deque(maxlen=1000)
+        self._created_at = time.monotonic()
+        self._instances: Dict[int, Dict[str, Any]] = {}
+        # 워커(인스턴스)별 prefix 상태: key -> (prefix 토큰, LlamaState). 각 워커 스레드만 접근
+        self.prefix_cache_size = max(0, prefix_cache_size)
+        self._prefix_states: Dict[int, "OrderedDict[str, tuple]"] = {}
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "expired": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "prefix_resident": 0,
+            "prefix_restored": 0,
+            "prefix_built": 0,
+            "prefix_failed": 0,
+        }
+
+    # ---------- 워커 ----------
+    def _pool(self) -> List[Any]:
+        return (self._get_pool() if self._get_pool else None) or []
+
+    def _worker_count(self) -> int:
+        return max(1, len(self._pool()))
+
+    def _ensure_workers(self) -> None:
+        # fork 이후 자식 프로세스에서는 워커 스레드를 다시 띄움
+        pid = os.getpid()
+        count = self._worker_count()
+        if self._pid == pid and len(self._workers) >= count and all(t.is_alive() for t in self._workers):
+            return
+        with self._lock:
+            if self._pid != pid:
+                self._queue = queue.PriorityQueue()
+                self._pending = 0
+                self._workers = []
+                self._instances = {}
+                self._prefix_states = {}
+            self._pid = pid
+            # 죽은 워커는 같은 번호로 다시 띄우고, 풀이 커졌으면 워커를 추가
+            workers = list(self._workers) + [None] * max(0, count - len(self._workers))
+            for i, t in enumerate(workers):
+                if t is None or not t.is_alive():
+                    t = threading.Thread(target=self._run, args=(i,), name=f"llm-worker-{i}", daemon=True)
+                    t.start()
+                    workers[i] = t
+                self._instances.setdefault(i, {"jobs": 0, "busy_s": 0.0, "busy": False})
+            self._workers = workers
+
+    def _model_for_worker(self, worker_id: int):
+        pool = self._pool()
+        if pool:
+            return pool[worker_id] if worker_id < len(pool) else None
+        return self._get_model()
+
+    def _pin_worker(self, worker_id: int) -> None:
+        # Linux에서 sched_setaffinity(0)은 호출한 스레드에만 적용되고,
+        # llama.cpp가 이 스레드에서 만드는 연산 스레드들이 그대로 상속함
+        cpus = self._get_affinity(worker_id) if self._get_affinity else None
+        if not cpus:
+            return
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (AttributeError, OSError, ValueError) as e:
+            logger.warning(f"Failed to pin llm-worker-{worker_id} to CPUs {sorted(cpus)}: {e}")
+
+    def _run(self, worker_id: int) -> None:
+        self._pin_worker(worker_id)
+        while True:
+            _, _, job = self._queue.get()
+            now = time.monotonic()
+            # 취소/만료 확인과 시작 표시를 한 번에 (호출 측 대기 시간 초과와 경합하지 않도록 _wait_started와 같은 락)
+            with self._lock:
+                self._pending -= 1
+                if job.cancelled:
+                    # 호출 측이 포기한 작업. 만료는 호출 측에서 이미 집계함
+                    if not job.expired:
+                        self._counters["cancelled"] += 1
+                    continue
+                expired = job.deadline is not None and now > job.deadline
+                if expired:
+                    job.expired = True
+                    self._counters["expired"] += 1
+                else:
+                    self._queue_waits.append(now - job.enqueued_at)
+                    job.dequeued_at = now
+                    job.started.set()
+            if expired:
+                self._fail(job, DeadlineExceededError(self.estimate_retry_after()))
+                continue
+            self._execute(worker_id, job)
+
+    def _prepare_prefix(self, worker_id: int, model: Any, prefix: str) -> None:
+        """
+        prefix의 KV 상태를 모델에 올려 둠.
+        - 이미 현재 입력의 앞부분이면 그대로 사용
+        - 저장된 상태가 있으면 load_state
+        - 없으면 prefix만 평가한 뒤 save_state로 저장
+        이후 completion 호출 시 llama.cpp가 공통 prefix 이후 토큰만 평가함.
+        """
+        cache = self._prefix_states.setdefault(worker_id, OrderedDict())
+        key = hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:16]
+        entry = cache.get(key)
+        tokens = entry[0] if entry else model.tokenize(prefix.encode("utf-8"), add_bos=True, special=True)
+        n = len(tokens)
+        if n and model.n_tokens >= n and list(model.input_ids[:n]) == tokens:
+            self._count("prefix_resident")
+        elif entry is not None:
+            model.load_state(entry[1])
+            self._count("prefix_restored")
+        else:
+            model.reset()
+            model.eval(tokens)
+            cache[key] = (tokens, model.save_state())
+            while len(cache) > self.prefix_cache_size:
+                cache.popitem(last=False)
+            self._count("prefix_built")
+        if key in cache:
+            cache.move_to_end(key)
+
+    @staticmethod
+    def _token_timer(job: _Job):
+        """샘플링된 토큰마다 호출되는 stopping_criteria로 첫 토큰 시각/토큰 수 측정 (중단하지 않음)."""
+        try:
+            from llama_cpp import StoppingCriteriaList
+        except Exception:
+            return None
+
+        def on_token(input_ids, logits) -> bool:
+            if job.first_token_at is None:
+                job.first_token_at = time.monotonic()
+            job.n_tokens += 1
+            return False
+
+        return StoppingCriteriaList([on_token])
+
+    def _execute(self, worker_id: int, job: _Job) -> None:
+        started = time.monotonic()
+        with self._lock:
+            self._instances[worker_id]["busy"] = True
+        try:
+            model = self._model_for_worker(worker_id)
+            if model is None:
+                raise RuntimeError("LLM model not loaded")
+            if job.prefix and self.prefix_cache_size:
+                try:
+                    self._prepare_prefix(worker_id, model, job.prefix)
+                except Exception as e:
+                    # prefix 캐시는 최적화일 뿐이므로 실패하면 전체 프롬프트를 평가
+                    logger.warning(f"Prefix state preparation failed on llm-worker-{worker_id}: {e}")
+                    self._count("prefix_failed")
+                    model.reset()
+            kwargs = dict(job.sampling)
+            timer = self._token_timer(job)
+            if timer is not None:
+                kwargs["stopping_criteria"] = timer
+            if job.stream:
+                for chunk in model(job.prompt, stream=True, echo=False, **kwargs):
+                    if job.cancelled:
+                        break
+                    job.chunks.put(chunk)
+                job.finished_at = time.monotonic()
+                job.chunks.put(_STREAM_END)
+                job.future.set_result(None)
+            else:
+                output = model(job.prompt, echo=False, **kwargs)
+                job.finished_at = time.monotonic()
+                job.future.set_result(output)
+            self._count("completed")
+        except Exception as e:
+            logger.error(f"LLM inference failed: {e}")
+            self._count("failed")
+            self._fail(job, e)
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._gen_times.append(elapsed)
+                instance = self._instances[worker_id]
+                instance["busy"] = False
+                instance["jobs"] += 1
+                instance["busy_s"] += elapsed
+
+    def _fail(self, job: _Job, error: Exception) -> None:
+        job.started.set()
+        if not job.future.done():
+            job.future.set_exception(error)
+        job.chunks.put(error)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    # ---------- 요청 ----------
+    def estimate_retry_after(self) -> int:
+        with self._lock:
+            avg = (sum(self._gen_times) / len(self._gen_times)) if self._gen_times else 5.0
+            backlog = self._pending + 1
+        return max(1, int(math.ceil(avg * backlog / max(1, self._worker_count()))))
+
+    def is_full(self) -> bool:
+        with self._lock:
+            return self._pending >= self.max_queue
+
+    def _submit(
+        self,
+        prompt: str,
+        sampling: Dict[str, Any],
+        stream: bool,
+        priority: int,
+        timeout: Optional[float],
+        prefix: Optional[str] = None,
+    ) -> _Job:
+        self._ensure_workers()
+        timeout = self.queue_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout and timeout > 0 else None
+        if prefix and not prompt.startswith(prefix):
+            prefix = None
+        job = _Job(prompt, sampling, stream, deadline, prefix)
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._counters["rejected"] += 1
+                full = True
+            else:
+                self._pending += 1
+                self._counters["submitted"] += 1
+                full = False
+        if full:
+            raise SchedulerBusyError(self.estimate_retry_after())
+        self._queue.put((priority, next(self._seq), job))
+        return job
+
+    def _wait_started(self, job: _Job) -> None:
+        remaining = None if job.deadline is None else max(0.0, job.deadline - time.monotonic())
+        if job.started.wait(timeout=remaining):
+            return
+        with self._lock:
+            # 대기가 끝난 직후 워커가 시작했으면 그대로 결과를 기다림
+            if job.started.is_set():
+                return
+            # 워커는 cancelled인 작업을 꺼내도 실행하지 않고 버림
+            job.expired = True
+            job.cancelled = True
+            self._counters["expired"] += 1
+        raise DeadlineExceededError(self.estimate_retry_after())
+
+    @staticmethod
+    def _trace_job(job: _Job) -> None:
+        """워커가 측정한 시간을 호출 스레드의 트레이스에 기록."""
+        if job.dequeued_at is None:
+            return
+        tracing.record("llm.queue_wait", job.dequeued_at - job.enqueued_at)
+        if job.first_token_at is not None:
+            tracing.record("llm.prompt_eval", job.first_token_at - job.dequeued_at)
+            if job.finished_at is not None:
+                tracing.record("llm.generation", job.finished_at - job.first_token_at, tokens=job.n_tokens)
+
+    def complete(
+        self,
+        prompt: str,
+        sampling: Dict[str, Any],
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None,
+        prefix: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """블로킹 completion. llama.cpp 출력 dict 반환. prefix는 prompt의 고정 앞부분 (KV 상태 재사용)."""
+        job = self._submit(prompt, sampling, False, priority, timeout, prefix)
+        self._wait_started(job)
+        try:
+            return job.future.result()
+        finally:
+            self._trace_job(job)
+
+    def stream(
+        self,
+        prompt: str,
+        sampling: Dict[str, Any],
+        priority: int = PRIORITY_INTERACTIVE,
+        timeout: Optional[float] = None,
+        prefix: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """스트리밍 completion. llama.cpp stream 청크를 그대로 yield."""
+        job = self._submit(prompt, sampling, True, priority, timeout, prefix)
+        try:
+            self._wait_started(job)
+            while True:
+                item = job.chunks.get()
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # 클라이언트가 연결을 끊으면 워커가 생성을 중단하도록 표시
+            job.cancelled = True
+            self._trace_job(job)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = list(self._queue_waits)
+            gens = list(self._gen_times)
+            stats: Dict[str, Any] = dict(self._counters)
+            stats["queue_depth"] = self._pending
+            uptime = max(1e-9, time.monotonic() - self._created_at)
+            instances = [
+                {
+                    "id": i,
+                    "busy": info["busy"],
+                    "jobs": info["jobs"],
+                    "busy_s": round(info["busy_s"], 3),
+                    "utilization": round(min(1.0, info["busy_s"] / uptime), 4),
+                }
+                for i, info in sorted(self._instances.items())
+            ]
+        stats["max_queue"] = self.max_queue
+        stats["queue_timeout_s"] = self.queue_timeout
+        stats["workers"] = self._worker_count()
+        stats["prefix_cache_size"] = self.prefix_cache_size
+        stats["instances"] = instances
+        stats["queue_wait_ms"] = _summary_ms(waits)
+        stats["generation_ms"] = _summary_ms(gens)
+        return stats
+
+
+def _summary_ms(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0, "avg": 0.0, "p50": 0.0, "p99": 0.0}
+    arr = np.array(values) * 1000.0
+    return {
+        "count": len(values),
+        "avg": round(float(arr.mean()), 1),
+        "p50": round(float(np.percentile(arr, 50)), 1),
+        "p99": round(float(np.percentile(arr, 99)), 1),
+    }
+
+
+_scheduler: Optional[InferenceScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_inference_scheduler() -> InferenceScheduler:
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                from src.models.model_manager import get_llm_affinity, get_llm_model, get_llm_pool
+
+                _scheduler = InferenceScheduler(
+                    get_model=get_llm_model,
+                    max_queue=int(os.getenv("LLM_QUEUE_MAX", "16")),
+                    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "60")),
+                    get_pool=get_llm_pool,
+                    get_affinity=get_llm_affinity,
+                    prefix_cache_size=(
+                        int(os.getenv("LLM_PREFIX_CACHE_SIZE", "4"))
+                        if os.getenv("LLM_PREFIX_CACHE", "true").lower() in ("1", "true", "yes")
+                        else 0
+                    ),
+                )
+    return _scheduler
+
+
+def run_completion(
+    prompt: str,
+    sampling: Dict[str, Any],
+    priority: int = PRIORITY_INTERACTIVE,
+    timeout: Optional[float] = None,
+    prefix: Optional[str] = None,
+) -> Dict[str, Any]:
+    return get_inference_scheduler().complete(prompt, sampling, priority=priority, timeout=timeout, prefix=prefix)
+
+
+def run_streaming_completion(
+    prompt: str,
+    sampling: Dict[str, Any],
+    priority: int = PRIORITY_INTERACTIVE,
+    timeout: Optional[float] = None,
+    prefix: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    return get_inference_scheduler().stream(prompt, sampling, priority=priority, timeout=timeout, prefix=prefix)
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    if _scheduler is None:
+        return {"submitted": 0, "queue_depth": 0}
+    return _scheduler.get_stats()
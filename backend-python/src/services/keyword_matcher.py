@@ -0,0 +1,70 @@
+"""
+다중 키워드 매칭 (Aho-Corasick)
+
+- 키워드 표로 오토마톤을 한 번만 구성하고, 검색은 입력 길이에 비례 (키워드 수와 무관)
+- 여러 키워드가 나오면 가장 긴 키워드, 길이가 같으면 등록 순서가 앞선 키워드를 선택
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class KeywordMatcher:
+    """(키워드, 값) 목록으로 구성. 키워드는 소문자로 비교."""
+
+    def __init__(self, items: Iterable[Tuple[str, Any]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 노드에서 끝나는 키워드 중 최선: (길이, 우선순위, 키워드, 값). 없으면 None
+        self._best: List[Optional[Tuple[int, int, str, Any]]] = [None]
+        for priority, (keyword, value) in enumerate(items):
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            node = 0
+            for ch in keyword:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                node = nxt
+            # 같은 키워드가 여러 번 있으면 먼저 등록된 것을 유지
+            if self._best[node] is None:
+                self._best[node] = (len(keyword), priority, keyword, value)
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                # 이 위치에서 끝나는 가장 긴 키워드는 노드 자신의 키워드. 없으면 실패 링크 쪽 결과를 물려받음
+                if self._best[child] is None:
+                    self._best[child] = self._best[self._fail[child]]
+
+    def _scan(self, text: str, best: Optional[Tuple[int, int, str, Any]]):
+        node = 0
+        goto, fail, node_best = self._goto, self._fail, self._best
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            found = node_best[node]
+            if found is not None and (best is None or found[0] > best[0] or (found[0] == best[0] and found[1] < best[1])):
+                best = found
+        return best
+
+    def find(self, *texts: str) -> Optional[Tuple[str, Any]]:
+        """주어진 텍스트들(이미 소문자) 중 어디든 등장하는 최선의 (키워드, 값)."""
+        best = None
+        for text in texts:
+            best = self._scan(text, best)
+        return (best[2], best[3]) if best is not None else None
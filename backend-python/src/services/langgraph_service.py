@@ -1,11 +1,20 @@
 from __future__ import annotations
 
-from typing import Any, Dict, TypedDict, Literal
+import contextvars
+import importlib.util
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional, TypedDict, Literal
 
-from langgraph.graph import StateGraph, END
+from src.services.llm_service import PromptAnalysis, analyze_prompt, generate_response
+from src.services.rag_service import generate_rag_response, is_rag_initialized, retrieve_documents
+from src.services.tracing import span, traced
 
-from src.services.llm_service import get_keyword_response, generate_response
-from src.services.rag_service import generate_rag_response, is_rag_initialized
+logger = logging.getLogger(__name__)
+
+RAG_TOP_K = 3
 
 
 class GraphState(TypedDict, total=False):
@@ -21,17 +30,27 @@ class GraphState(TypedDict, total=False):
     documents: list
     intent: str
     category: str
+    cache_hit: bool
+    cache_type: str
+    analysis: PromptAnalysis
+    retrieval: Future
+
+
+def _analysis(state: GraphState) -> PromptAnalysis:
+    analysis = state.get("analysis")
+    if analysis is None:
+        analysis = analyze_prompt(state.get("prompt", ""), state.get("language", "ko"))
+    return analysis
 
 
 def _normalize_input(state: GraphState) -> Dict[str, Any]:
-    prompt = (state.get("prompt") or "").strip()
-    return {"clean_prompt": prompt}
+    # 키워드 매칭/분류는 여기서 한 번만 수행하고 이후 노드는 결과를 재사용
+    analysis = _analysis(state)
+    return {"clean_prompt": analysis.prompt, "analysis": analysis}
 
 
 def _keyword_check(state: GraphState) -> Dict[str, Any]:
-    prompt = state.get("prompt", "")
-    language = state.get("language", "ko")
-    resp = get_keyword_response(prompt, language)
+    resp = _analysis(state).keyword_hit()
     if not resp:
         print("[LangGraph] keyword: miss -> rag")
         return {"intent": "classify"}
@@ -45,20 +64,27 @@ def _keyword_check(state: GraphState) -> Dict[str, Any]:
 
 
 def _classify_question(state: GraphState) -> Dict[str, Any]:
-    question = (state.get("prompt") or "").lower()
-    school_keywords = [
-        "학과", "학과소개", "모집", "입학", "서류", "전형", "면접", "필기",
-        "교육비", "훈련", "장려금", "취업", "취업현황", "교학처", "연락처",
-        "위치", "주소", "주차", "식당", "캠퍼스", "교수", "교수님",
-        "수료", "과정", "커리큘럼", "수강", "모집요강"
-    ]
-    if any(k in question for k in school_keywords):
+    if _analysis(state).category == "school":
         print("[LangGraph] classify: school -> rag")
         return {"category": "school"}
     print("[LangGraph] classify: general -> llm")
     return {"category": "general"}
 
 
+def _speculative_documents(state: GraphState) -> Optional[list]:
+    """invoke_graph에서 미리 시작한 검색 결과. 없거나 실패하면 None (일반 검색으로 진행)."""
+    future = state.get("retrieval")
+    if future is None:
+        return None
+    try:
+        docs = future.result()
+        print(f"[LangGraph] rag: speculative retrieval used docs={len(docs)}")
+        return docs
+    except Exception as e:
+        logger.warning(f"Speculative retrieval failed, retrieving again: {e}")
+        return None
+
+
 def _rag_answer(state: GraphState) -> Dict[str, Any]:
     if not is_rag_initialized():
         print("[LangGraph] rag: not initialized -> llm fallback")
@@ -66,7 +92,9 @@ def _rag_answer(state: GraphState) -> Dict[str, Any]:
     query = state.get("prompt", "")
     language = state.get("language", "ko")
     print("[LangGraph] rag: search start")
-    result = generate_rag_response(query=query, language=language, k=3)
+    result = generate_rag_response(
+        query=query, language=language, k=RAG_TOP_K, documents=_speculative_documents(state)
+    )
     source = result.get("source", "")
     response = result.get("response", "")
     updates: Dict[str, Any] = {
@@ -74,6 +102,8 @@ def _rag_answer(state: GraphState) -> Dict[str, Any]:
         "source": source,
         "tokens_used": result.get("tokens_used", 0),
         "documents": result.get("documents", []),
+        "cache_hit": result.get("cache_hit", False),
+        "cache_type": result.get("cache_type", ""),
     }
     if source == "none" or not response:
         print("[LangGraph] rag: no answer -> llm fallback")
@@ -96,12 +126,15 @@ def _llm_answer(state: GraphState) -> Dict[str, Any]:
         max_tokens=max_tokens,
         temperature=temperature,
         language=language,
+        analysis=_analysis(state),
     )
     print("[LangGraph] llm: done")
     return {
         "response": result.get("response", ""),
         "source": result.get("source", "llm"),
         "tokens_used": result.get("tokens_used", 0),
+        "cache_hit": result.get("cache_hit", False),
+        "cache_type": result.get("cache_type", ""),
     }
 
 
@@ -124,26 +157,16 @@ def _route_after_rag(state: GraphState) -> Literal["end", "llm"]:
     return "end"
 
 
-def _route_after_keyword(state: GraphState) -> Literal["keyword", "rag", "llm"]:
-    intent = state.get("intent", "")
-    if intent == "keyword":
-        return "keyword"
-    return "rag" if is_rag_initialized() else "llm"
-
-
-def _route_after_rag(state: GraphState) -> Literal["end", "llm"]:
-    if state.get("intent") == "llm_fallback":
-        return "llm"
-    return "end"
-
-
 def _build_graph():
+    # langgraph(+langchain)는 import가 무거워 첫 그래프 호출 때 가져옴
+    from langgraph.graph import StateGraph, END
+
     workflow = StateGraph(GraphState)
-    workflow.add_node("normalize", _normalize_input)
-    workflow.add_node("keyword_check", _keyword_check)
-    workflow.add_node("classify", _classify_question)
-    workflow.add_node("rag_answer", _rag_answer)
-    workflow.add_node("llm_answer", _llm_answer)
+    workflow.add_node("normalize", traced("graph.normalize")(_normalize_input))
+    workflow.add_node("keyword_check", traced("graph.keyword_check")(_keyword_check))
+    workflow.add_node("classify", traced("graph.classify")(_classify_question))
+    workflow.add_node("rag_answer", traced("graph.rag_answer")(_rag_answer))
+    workflow.add_node("llm_answer", traced("graph.llm_answer")(_llm_answer))
 
     workflow.set_entry_point("normalize")
     workflow.add_edge("normalize", "keyword_check")
@@ -181,6 +204,53 @@ def _build_graph():
 
 _GRAPH_APP = None
 
+_retrieval_executor: Optional[ThreadPoolExecutor] = None
+_retrieval_executor_pid: Optional[int] = None
+_retrieval_executor_lock = threading.Lock()
+
+
+def _speculative_retrieval_enabled() -> bool:
+    return os.getenv("RAG_SPECULATIVE_RETRIEVAL", "false").lower() in ("1", "true", "yes")
+
+
+def _get_retrieval_executor() -> ThreadPoolExecutor:
+    # fork 이후 자식 프로세스에서는 새 스레드 풀 사용
+    global _retrieval_executor, _retrieval_executor_pid
+    pid = os.getpid()
+    if _retrieval_executor is None or _retrieval_executor_pid != pid:
+        with _retrieval_executor_lock:
+            if _retrieval_executor is None or _retrieval_executor_pid != pid:
+                _retrieval_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("RAG_SPECULATIVE_WORKERS", "4")),
+                    thread_name_prefix="rag-speculative",
+                )
+                _retrieval_executor_pid = pid
+    return _retrieval_executor
+
+
+def _start_speculative_retrieval(prompt: str) -> Optional[Future]:
+    """
+    쿼리 임베딩 + 인덱스 검색을 그래프 라우팅(keyword/classify)과 동시에 시작.
+    rag_answer로 가면 결과를 사용하고, 다른 경로로 끝나면 버림.
+    """
+    if not _speculative_retrieval_enabled() or not is_rag_initialized() or not prompt.strip():
+        return None
+    try:
+        # 현재 트레이스 안에서 검색 구간이 기록되도록 컨텍스트를 복사해 실행
+        context = contextvars.copy_context()
+        return _get_retrieval_executor().submit(context.run, retrieve_documents, prompt, RAG_TOP_K)
+    except RuntimeError as e:
+        logger.warning(f"Speculative retrieval not started: {e}")
+        return None
+
+
+def is_langgraph_available() -> bool:
+    """langgraph 설치 여부 (import 없이 확인)."""
+    try:
+        return importlib.util.find_spec("langgraph") is not None
+    except Exception:
+        return False
+
 
 def get_graph_app():
     global _GRAPH_APP
@@ -204,7 +274,16 @@ def invoke_graph(
         "max_tokens": max_tokens,
         "temperature": temperature,
     }
-    result = app.invoke(state)
+    retrieval = _start_speculative_retrieval(prompt)
+    if retrieval is not None:
+        state["retrieval"] = retrieval
+    try:
+        with span("graph.invoke"):
+            result = app.invoke(state)
+    finally:
+        if retrieval is not None:
+            # rag_answer로 가지 않은 경우 아직 시작 전이면 취소
+            retrieval.cancel()
     return {
         "response": result.get("response", ""),
         "tokens_used": result.get("tokens_used", 0),
@@ -213,4 +292,6 @@ def invoke_graph(
         "source": result.get("source", "unknown"),
         "documents": result.get("documents", []),
         "user_id": user_id,
+        "cache_hit": result.get("cache_hit", False),
+        "cache_type": result.get("cache_type") or None,
     }
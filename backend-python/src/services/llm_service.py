@@ -1,8 +1,19 @@
 import logging
 import re
-from typing import Optional, Dict, Any
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Iterator
 
 from src.models.model_manager import get_llm_model
+from src.services.inference_scheduler import (
+    PRIORITY_INTERACTIVE,
+    DeadlineExceededError,
+    SchedulerBusyError,
+    run_completion,
+    run_streaming_completion,
+)
+from src.services.keyword_matcher import KeywordMatcher
+from src.services.response_cache import get_response_cache, response_cache_key, text_hash
 
 logger = logging.getLogger(__name__)
 
@@ -413,21 +424,17 @@ EN_KEYWORD_MAP = {
 }
 
 
-def get_keyword_response(prompt: str, language: str = "ko") -> Optional[Dict[str, Any]]:
-    """간단 키워드 매칭 응답."""
-    prompt_lower = prompt.lower()
-    prompt_clean = re.sub(r"[^0-9A-Za-z\u3131-\u318E\uAC00-\uD7A3\s]", "", prompt_lower).strip()
-    responses = KEYWORD_RESPONSES.get(language, KEYWORD_RESPONSES["ko"])
+_CLEAN_RE = re.compile(r"[^0-9A-Za-z\u3131-\u318E\uAC00-\uD7A3\s]")
+_GREETINGS = {"ko": ({"안녕", "안녕하세요", "반가워"}, "인사"), "en": ({"hello", "hi", "hey"}, "greeting")}
 
-    if language == "ko":
-        keyword_map = KO_KEYWORD_MAP
-    else:
-        keyword_map = EN_KEYWORD_MAP
 
-    if language == "ko" and prompt_clean in {"안녕", "안녕하세요", "반가워"}:
-        resp = responses.get("인사")
-        if resp:
-            return {
+def _build_keyword_tables():
+    """언어별 (응답 dict, 매처). 응답이 없는 키워드는 제외하고 import 시 한 번만 구성."""
+    tables = {}
+    for language, keyword_map in (("ko", KO_KEYWORD_MAP), ("en", EN_KEYWORD_MAP)):
+        responses = KEYWORD_RESPONSES.get(language, KEYWORD_RESPONSES["ko"])
+        prebuilt = {
+            key: {
                 "response": resp["content"],
                 "tokens_used": 0,
                 "model": "KEYWORD_MATCHER",
@@ -435,31 +442,77 @@ def get_keyword_response(prompt: str, language: str = "ko") -> Optional[Dict[str
                 "source": "keyword",
                 "title": resp.get("title", ""),
             }
+            for key, resp in responses.items()
+        }
+        matcher = KeywordMatcher(
+            (keyword, response_key) for keyword, response_key in keyword_map.items() if response_key in prebuilt
+        )
+        tables[language] = (prebuilt, matcher)
+    return tables
 
-    if language != "ko" and prompt_clean in {"hello", "hi", "hey"}:
-        resp = responses.get("greeting")
-        if resp:
-            return {
-                "response": resp["content"],
-                "tokens_used": 0,
-                "model": "KEYWORD_MATCHER",
-                "language": language,
-                "source": "keyword",
-                "title": resp.get("title", ""),
-            }
 
-    for keyword, response_key in keyword_map.items():
-        if (keyword in prompt_lower or keyword in prompt_clean) and response_key in responses:
-            resp = responses[response_key]
-            return {
-                "response": resp["content"],
-                "tokens_used": 0,
-                "model": "KEYWORD_MATCHER",
-                "language": language,
-                "source": "keyword",
-                "title": resp.get("title", ""),
-            }
-    return None
+_KEYWORD_TABLES = _build_keyword_tables()
+
+
+def _match_keyword(prompt_lower: str, prompt_clean: str, language: str) -> Optional[Dict[str, Any]]:
+    table = "ko" if language == "ko" else "en"
+    prebuilt, matcher = _KEYWORD_TABLES[table]
+
+    greetings, greeting_key = _GREETINGS[table]
+    if prompt_clean in greetings and greeting_key in prebuilt:
+        return dict(prebuilt[greeting_key], language=language)
+
+    found = matcher.find(prompt_lower, prompt_clean)
+    if found is None:
+        return None
+    return dict(prebuilt[found[1]], language=language)
+
+
+def get_keyword_response(prompt: str, language: str = "ko") -> Optional[Dict[str, Any]]:
+    """간단 키워드 매칭 응답. 여러 키워드가 포함되면 가장 긴(구체적인) 키워드 우선."""
+    prompt_lower = prompt.lower()
+    return _match_keyword(prompt_lower, _CLEAN_RE.sub("", prompt_lower).strip(), language)
+
+
+# 학교 관련 질문(RAG 대상) 분류 키워드
+SCHOOL_KEYWORDS = [
+    "학과", "학과소개", "모집", "입학", "서류", "전형", "면접", "필기",
+    "교육비", "훈련", "장려금", "취업", "취업현황", "교학처", "연락처",
+    "위치", "주소", "주차", "식당", "캠퍼스", "교수", "교수님",
+    "수료", "과정", "커리큘럼", "수강", "모집요강",
+]
+_SCHOOL_MATCHER = KeywordMatcher((keyword, "school") for keyword in SCHOOL_KEYWORDS)
+
+
+@dataclass(frozen=True)
+class PromptAnalysis:
+    """요청당 한 번 계산하는 프롬프트 분석 결과 (키워드 응답/분류를 여러 단계에서 재사용)."""
+
+    prompt: str
+    language: str
+    lower: str
+    clean: str
+    keyword_response: Optional[Dict[str, Any]]
+    category: str  # school | general
+
+    def keyword_hit(self) -> Optional[Dict[str, Any]]:
+        """키워드 응답 사본 (호출 측에서 user_id 등을 덧붙여도 원본이 바뀌지 않도록)."""
+        return dict(self.keyword_response) if self.keyword_response else None
+
+
+def analyze_prompt(prompt: str, language: str = "ko") -> PromptAnalysis:
+    """정규화 + 키워드 매칭 + 분류를 한 번에 수행."""
+    prompt = (prompt or "").strip()
+    prompt_lower = prompt.lower()
+    prompt_clean = _CLEAN_RE.sub("", prompt_lower).strip()
+    return PromptAnalysis(
+        prompt=prompt,
+        language=language,
+        lower=prompt_lower,
+        clean=prompt_clean,
+        keyword_response=_match_keyword(prompt_lower, prompt_clean, language),
+        category="school" if _SCHOOL_MATCHER.find(prompt_lower) else "general",
+    )
 
 
 def _build_system_prompt(language: str) -> str:
@@ -476,16 +529,42 @@ def _build_system_prompt(language: str) -> str:
     )
 
 
+def _build_prompt_prefix(language: str) -> str:
+    """요청마다 동일한 프롬프트 앞부분 (KV 상태 재사용 대상)."""
+    user_prefix = "사용자: " if language == "ko" else "User: "
+    return f"{_build_system_prompt(language)}\n\n{user_prefix}"
+
+
+def _build_full_prompt(prompt: str, language: str) -> str:
+    suffix = "\n답변:" if language == "ko" else "\nResponse:"
+    return f"{_build_prompt_prefix(language)}{prompt}{suffix}"
+
+
+def _llm_sampling(max_tokens: int, temperature: float) -> Dict[str, Any]:
+    return {
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+        "top_p": 0.95,
+        "top_k": 50,
+        "repeat_penalty": 1.1,
+    }
+
+
 def generate_response(
     prompt: str,
     user_id: str = "default",
     max_tokens: int = 256,
     temperature: float = 0.7,
     language: str = "ko",
+    priority: int = PRIORITY_INTERACTIVE,
+    analysis: Optional[PromptAnalysis] = None,
 ) -> Dict[str, Any]:
-    """LLM 기반 응답 (키워드 우선, 없으면 LLM)."""
+    """LLM 기반 응답 (키워드 우선, 없으면 LLM). analysis가 있으면 키워드 매칭을 다시 하지 않음."""
     try:
-        keyword_resp = get_keyword_response(prompt, language)
+        if analysis is not None and analysis.language == language:
+            keyword_resp = analysis.keyword_hit()
+        else:
+            keyword_resp = get_keyword_response(prompt, language)
         if keyword_resp:
             keyword_resp["user_id"] = user_id
             return keyword_resp
@@ -502,33 +581,49 @@ def generate_response(
                 "error": "model_not_loaded",
             }
 
-        system_prompt = _build_system_prompt(language)
-        prefix = "사용자: " if language == "ko" else "User: "
-        suffix = "\n답변:" if language == "ko" else "\nResponse:"
-        full_prompt = f"{system_prompt}\n\n{prefix}{prompt}{suffix}"
-
-        output = model(
+        full_prompt = _build_full_prompt(prompt, language)
+        sampling = _llm_sampling(max_tokens, temperature)
+
+        cache = get_response_cache()
+        cache_key = None
+        if cache is not None and cache.accepts(sampling):
+            cache_key = response_cache_key(
+                kind="llm",
+                # 생성에 쓰는 프롬프트 그대로 (정규화하면 다른 입력의 응답을 돌려줄 수 있음)
+                prompt=prompt,
+                language=language,
+                index_version=None,
+                template=text_hash(_build_full_prompt("", language)),
+                sampling=sampling,
+            )
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return dict(cached, user_id=user_id, cache_hit=True, cache_type="exact")
+
+        output = run_completion(
             full_prompt,
-            max_tokens=max_tokens,
-            temperature=temperature,
-            top_p=0.95,
-            top_k=50,
-            repeat_penalty=1.1,
-            echo=False,
+            sampling,
+            priority=priority,
+            prefix=_build_prompt_prefix(language),
         )
 
         response_text = output["choices"][0]["text"].strip()
         tokens_used = output.get("usage", {}).get("completion_tokens", 0)
 
-        return {
+        result = {
             "response": response_text,
             "tokens_used": tokens_used,
             "model": "LLM",
-            "user_id": user_id,
             "language": language,
             "source": "llm",
         }
+        if cache_key is not None:
+            cache.put(cache_key, result)
+        return dict(result, user_id=user_id, cache_hit=False)
 
+    except (SchedulerBusyError, DeadlineExceededError):
+        # 과부하는 라우트에서 503/Retry-After로 응답
+        raise
     except Exception as e:
         logger.error(f"LLM Generation Error: {e}")
         error_msg = f"오류가 발생했습니다: {e}" if language == "ko" else f"Error occurred: {e}"
@@ -542,6 +637,79 @@ def generate_response(
         }
 
 
+def stream_completion(
+    prompt: str,
+    sampling: Dict[str, Any],
+    started: float,
+    prefix: Optional[str] = None,
+    **done_fields: Any,
+) -> Iterator[Dict[str, Any]]:
+    """스케줄러를 통한 llama.cpp stream=True 출력을 token 이벤트로 변환하고 마지막에 done 이벤트 전송."""
+    tokens = 0
+    first_token_at = None
+    for chunk in run_streaming_completion(prompt, sampling, prefix=prefix):
+        text = chunk["choices"][0].get("text", "")
+        tokens += 1
+        if first_token_at is None:
+            # 비스트리밍 응답의 strip()과 맞추기 위해 앞쪽 공백 제거
+            text = text.lstrip()
+        if not text:
+            continue
+        if first_token_at is None:
+            first_token_at = time.perf_counter()
+        yield {"event": "token", "data": {"text": text}}
+    done = dict(done_fields)
+    done["tokens_used"] = tokens
+    done["ttft_ms"] = round((first_token_at - started) * 1000, 1) if first_token_at else None
+    done["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    yield {"event": "done", "data": done}
+
+
+def stream_response(
+    prompt: str,
+    user_id: str = "default",
+    max_tokens: int = 256,
+    temperature: float = 0.7,
+    language: str = "ko",
+    analysis: Optional[PromptAnalysis] = None,
+) -> Iterator[Dict[str, Any]]:
+    """generate_response의 스트리밍 버전. documents → token... → done 이벤트를 yield."""
+    started = time.perf_counter()
+    yield {"event": "documents", "data": {"documents": []}}
+
+    if analysis is not None and analysis.language == language:
+        keyword_resp = analysis.keyword_response
+    else:
+        keyword_resp = get_keyword_response(prompt, language)
+    if keyword_resp:
+        yield {"event": "token", "data": {"text": keyword_resp["response"]}}
+        yield {
+            "event": "done",
+            "data": {"source": "keyword", "tokens_used": 0, "language": language, "user_id": user_id},
+        }
+        return
+
+    model = get_llm_model()
+    if not model:
+        msg = "모델 로딩 중입니다. 잠시 후 다시 시도해 주세요." if language == "ko" else "Model is loading. Please try again."
+        yield {"event": "token", "data": {"text": msg}}
+        yield {
+            "event": "done",
+            "data": {"source": "llm", "tokens_used": 0, "language": language, "user_id": user_id, "error": "model_not_loaded"},
+        }
+        return
+
+    yield from stream_completion(
+        _build_full_prompt(prompt, language),
+        _llm_sampling(max_tokens, temperature),
+        started,
+        prefix=_build_prompt_prefix(language),
+        source="llm",
+        language=language,
+        user_id=user_id,
+    )
+
+
 def create_system_prompt(intent: str = "general") -> str:
     prompts = {
         "general": "질문에 간단하고 명확하게 답변하세요.",
@@ -0,0 +1,261 @@
+"""
+PDF 텍스트 병렬 추출 (pypdf)
+
+- 페이지 단위 작업을 ProcessPoolExecutor로 분산 (pypdf extract_text는 순수 파이썬이라 CPU 바운드, GIL 때문에 스레드로는 확장 안 됨)
+- 결과는 입력 PDF 순서 / 페이지 순서 그대로 반환 (완료 순서와 무관)
+- 페이지별 타임아웃: 워커에서 SIGALRM으로 중단하고 빈 텍스트로 처리 (지원하지 않는 플랫폼은 전체 대기 시간 상한으로 대체)
+- 워커는 spawn으로 시작 (모델 로딩 스레드가 있는 프로세스를 fork 하지 않도록). 이 모듈은 pypdf 외에 무거운 import가 없어야 함
+- PdfExtractCache: (파일 내용 sha256, 추출기, 추출기 버전/방식) -> 페이지별 텍스트. 바뀌지 않은 PDF는 다시 추출하지 않음
+"""
+
+import hashlib
+import json
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    from pypdf import PdfReader
+except Exception:
+    PdfReader = None
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+
+# 워커 프로세스별 PdfReader 캐시 (같은 PDF의 페이지마다 다시 파싱하지 않도록)
+_READERS: Dict[str, "PdfReader"] = {}
+_READER_CACHE_SIZE = 4
+
+
+class _PageTimeout(Exception):
+    pass
+
+
+def extract_workers() -> int:
+    """PDF_EXTRACT_WORKERS (0 또는 미지정: CPU 코어 수, 1: 현재 프로세스에서 순차 추출)."""
+    workers = int(os.getenv("PDF_EXTRACT_WORKERS", "0"))
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def page_timeout() -> float:
+    """PDF_PAGE_TIMEOUT 초 (0이면 제한 없음)."""
+    return float(os.getenv("PDF_PAGE_TIMEOUT", "30"))
+
+
+def _get_reader(path: str) -> "PdfReader":
+    reader = _READERS.get(path)
+    if reader is None:
+        if len(_READERS) >= _READER_CACHE_SIZE:
+            _READERS.pop(next(iter(_READERS)))
+        reader = _READERS[path] = PdfReader(path)
+    return reader
+
+
+@contextmanager
+def _page_alarm(timeout: float) -> Iterator[None]:
+    # 시그널은 메인 스레드에서만 받을 수 있음 (워커 프로세스의 작업은 메인 스레드에서 실행)
+    if (
+        not timeout
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def _on_alarm(signum, frame):
+        raise _PageTimeout()
+
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def file_sha256(path: Path) -> Optional[str]:
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    except OSError as e:
+        logger.warning(f"Cannot hash {path}: {e}")
+        return None
+    return h.hexdigest()
+
+
+def extractor_version(extractor: str, method: str = "") -> str:
+    """추출 결과를 결정하는 추출기 버전/방식 (예: pypdf==4.3.1, chandra-ocr==0.1.0/hf)."""
+    package = {"pypdf": "pypdf", "chandra": "chandra-ocr"}.get(extractor, extractor)
+    try:
+        version = metadata.version(package)
+    except Exception:
+        version = "unknown"
+    return f"{package}=={version}" + (f"/{method}" if method else "")
+
+
+class PdfExtractCache:
+    """SQLite 기반 PDF 페이지 텍스트 캐시. 같은 경로의 이전 내용/버전 항목은 저장 시 정리."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pdf_pages ("
+            " key TEXT PRIMARY KEY,"
+            " path TEXT NOT NULL,"
+            " extractor TEXT NOT NULL,"
+            " pages TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_pdf_pages_path ON pdf_pages(path, extractor)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(file_hash: str, extractor: str, version: str) -> str:
+        return hashlib.sha256(f"{file_hash}\x00{extractor}\x00{version}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            row = self._conn.execute("SELECT pages FROM pdf_pages WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError:
+            return None
+
+    def put(self, key: str, path: Path, extractor: str, pages: List[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM pdf_pages WHERE path = ? AND extractor = ? AND key != ?",
+                (str(path), extractor, key),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pdf_pages (key, path, extractor, pages, created) VALUES (?, ?, ?, ?, ?)",
+                (key, str(path), extractor, json.dumps(pages, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _extract_page(path: str, page_idx: int, timeout: float) -> Tuple[str, str]:
+    """(텍스트, 상태). 예외를 밖으로 내보내지 않음."""
+    try:
+        with _page_alarm(timeout):
+            reader = _get_reader(path)
+            return reader.pages[page_idx].extract_text() or "", STATUS_OK
+    except _PageTimeout:
+        return "", STATUS_TIMEOUT
+    except Exception:
+        return "", STATUS_ERROR
+
+
+def _page_count(path: Path) -> Optional[int]:
+    try:
+        return len(PdfReader(str(path)).pages)
+    except Exception as e:
+        print(f"  ❌ PDF 읽기 실패 ({path.name}): {e}")
+        logger.error(f"Failed to read {path}: {e}")
+        return None
+
+
+def _terminate(executor: ProcessPoolExecutor) -> None:
+    # 시간 초과로 멈춘 워커가 남지 않도록 강제 종료
+    processes = getattr(executor, "_processes", None) or {}
+    for process in list(processes.values()):
+        try:
+            process.terminate()
+        except Exception:
+            pass
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pdf_pages(
+    pdf_paths: Sequence[Path],
+    workers: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> Dict[Path, List[Optional[str]]]:
+    """
+    PDF별 페이지 텍스트 목록 (페이지 순서). 추출 실패 페이지는 빈 문자열,
+    시간 초과/워커 비정상 종료로 결과가 없는 페이지는 None (다음 빌드에서 다시 시도하도록 캐시하지 않음).
+    열 수 없는 PDF는 결과에서 빠짐.
+    """
+    if PdfReader is None:
+        return {}
+    workers = workers or extract_workers()
+    timeout = page_timeout() if timeout is None else timeout
+
+    counts: Dict[Path, int] = {}
+    for path in pdf_paths:
+        n = _page_count(path)
+        if n is not None:
+            counts[path] = n
+            print(f"     - {path.name}: {n}페이지")
+    results: Dict[Path, List[Optional[str]]] = {path: [None] * n for path, n in counts.items()}
+    tasks = [(path, i) for path, n in counts.items() for i in range(n)]
+    if not tasks:
+        return results
+
+    started = time.perf_counter()
+    statuses: Dict[str, int] = {STATUS_OK: 0, STATUS_TIMEOUT: 0, STATUS_ERROR: 0}
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        for path, i in tasks:
+            text, status = _extract_page(str(path), i, timeout)
+            results[path][i] = text if status != STATUS_TIMEOUT else None
+            statuses[status] += 1
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        pending = set()
+        try:
+            futures = {
+                executor.submit(_extract_page, str(path), i, timeout): (path, i) for path, i in tasks
+            }
+            # SIGALRM이 없는 플랫폼에서도 한 페이지 때문에 빌드가 멈추지 않도록 전체 대기 시간 상한
+            overall = timeout * (math.ceil(len(tasks) / workers) + 1) + 30 if timeout else None
+            done, pending = wait(futures, timeout=overall)
+            for future in done:
+                path, i = futures[future]
+                try:
+                    text, status = future.result()
+                except Exception:
+                    # 워커 프로세스 비정상 종료 등
+                    text, status = None, STATUS_ERROR
+                results[path][i] = text if status != STATUS_TIMEOUT else None
+                statuses[status] += 1
+            statuses[STATUS_TIMEOUT] += len(pending)
+        finally:
+            if pending:
+                _terminate(executor)
+            else:
+                executor.shutdown(wait=True)
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"  ⏱️ PDF 페이지 추출: {len(tasks)}페이지, workers={workers}, {elapsed:.1f}s"
+        f" (시간 초과 {statuses[STATUS_TIMEOUT]}, 실패 {statuses[STATUS_ERROR]})"
+    )
+    if statuses[STATUS_TIMEOUT]:
+        logger.warning(f"{statuses[STATUS_TIMEOUT]} PDF page(s) exceeded PDF_PAGE_TIMEOUT={timeout}s and were skipped")
+    return results
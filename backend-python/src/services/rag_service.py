@@ -10,14 +10,18 @@ RAG (Retrieval Augmented Generation) 서비스
 
 
 
+import hashlib
+import importlib.util
 import json
 import logging
 import os
 import pickle
 import re
+import threading
+import time
 from pathlib import Path
 
-from typing import List, Dict, Any, Optional, Tuple
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Tuple
 
 
 
@@ -34,21 +38,43 @@ try:
 except Exception:
     PdfReader = None
 
+# chandra(OCR 모델, torch/transformers 포함)는 설치 여부만 확인하고 실제 import는 OCR 시점에 수행
 try:
-    from chandra.input import load_file as chandra_load_file
-    from chandra.model import InferenceManager
-    from chandra.model.schema import BatchInputItem
-    _CHANDRA_AVAILABLE = True
+    _CHANDRA_AVAILABLE = importlib.util.find_spec("chandra") is not None
 except Exception:
-    chandra_load_file = None
-    InferenceManager = None
-    BatchInputItem = None
     _CHANDRA_AVAILABLE = False
 
 
-from src.services.embedding_service import clean_text, chunk_text, deduplicate
-from langchain_core.prompts import PromptTemplate
-
+from src.services.embedding_service import clean_text, chunk_text, deduplicate, topk_inner_product
+from src.services.embedding_batcher import get_embedding_batcher, is_batching_enabled
+from src.services.embedding_store import encode_with_store
+from src.services.pdf_extract import PdfExtractCache, extract_pdf_pages, extractor_version, file_sha256
+from src.services.ann_index import apply_search_params, build_index, evaluate_index_types, get_index_config
+from src.services.lru_cache import LRUTTLCache
+from src.services.response_cache import get_response_cache, response_cache_key, text_hash
+from src.services.semantic_cache import get_semantic_cache
+from src.services.tracing import span
+from src.services.llm_service import stream_completion
+from src.services.inference_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    DeadlineExceededError,
+    SchedulerBusyError,
+    run_completion,
+)
+from src.services.rag_store import (
+    MetadataColumns,
+    TextStore,
+    atomic_path,
+    atomic_write,
+    save_array,
+    columns_exist,
+    store_exists,
+    write_text_store,
+)
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import PromptTemplate
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +85,8 @@ _chandra_manager_method = None
 def _get_chandra_manager(method: str):
     global _chandra_manager, _chandra_manager_method
     if _chandra_manager is None or _chandra_manager_method != method:
+        from chandra.model import InferenceManager
+
         _chandra_manager = InferenceManager(method=method)
         _chandra_manager_method = method
     return _chandra_manager
@@ -68,6 +96,9 @@ def _extract_pdf_text_chandra(pdf_path: Path, method: str) -> List[str]:
     if not _CHANDRA_AVAILABLE:
         return []
     try:
+        from chandra.input import load_file as chandra_load_file
+        from chandra.model.schema import BatchInputItem
+
         images = chandra_load_file(str(pdf_path), {})
         if not images:
             return []
@@ -110,6 +141,16 @@ def _get_embedding_model():
         return None
 
 
+def _get_embedding_signature() -> Optional[Dict[str, Any]]:
+    try:
+        from src.models.model_manager import get_embedding_signature
+
+        return get_embedding_signature()
+    except Exception as e:
+        logger.warning(f"Embedding signature unavailable: {e}")
+        return None
+
+
 def _get_llm_model():
     try:
         from src.models.model_manager import get_llm_model
@@ -120,6 +161,16 @@ def _get_llm_model():
         return None
 
 
+def _encode_queries(embedding_model, queries: List[str]) -> np.ndarray:
+    """쿼리 임베딩. 단일 쿼리는 (배칭이 켜져 있으면) 요청 간 마이크로 배치로 모아서 실행."""
+    if len(queries) == 1 and is_batching_enabled():
+        return get_embedding_batcher().encode(queries)
+    q_emb = embedding_model.encode(queries, convert_to_numpy=True)
+    if isinstance(q_emb, list):
+        q_emb = np.vstack(q_emb)
+    return q_emb
+
+
 def _simple_hash_embeddings(texts: List[str], dim: int = 512) -> np.ndarray:
     mat = np.zeros((len(texts), dim), dtype=np.float32)
     for i, text in enumerate(texts):
@@ -149,8 +200,36 @@ _rag_system = {
     "dimension": None,
     "original_dimension": None,
     "use_faiss": False,
+    "index_config": None,
+    "content_version": None,
+    "index_version": None,
 }
 
+# (쿼리 원문, 모델) -> PCA/정규화까지 끝난 쿼리 벡터. 인덱스를 다시 만들거나 로드하면 비움.
+# 설정(.env)은 app.py가 이 모듈을 import 한 뒤에 로드되므로 처음 사용할 때 생성
+_query_cache: Optional[LRUTTLCache] = None
+_query_cache_lock = threading.Lock()
+
+
+def _get_query_cache() -> LRUTTLCache:
+    global _query_cache
+    if _query_cache is None:
+        with _query_cache_lock:
+            if _query_cache is None:
+                _query_cache = LRUTTLCache(
+                    maxsize=int(os.getenv("QUERY_EMBED_CACHE_SIZE", "1024")),
+                    ttl=float(os.getenv("QUERY_EMBED_CACHE_TTL", "3600")),
+                )
+    return _query_cache
+
+
+def _reset_query_cache() -> None:
+    """캐시를 버림. 다음 사용 시 현재 설정으로 다시 생성."""
+    global _query_cache
+    with _query_cache_lock:
+        _query_cache = None
+
+
 CACHE_DIR = Path(__file__).with_name("rag_cache")
 CACHE_INDEX = CACHE_DIR / "faiss.index"
 CACHE_EMB = CACHE_DIR / "embeddings.npy"
@@ -158,22 +237,103 @@ CACHE_CHUNKS = CACHE_DIR / "chunks.json"
 CACHE_META = CACHE_DIR / "metadatas.json"
 CACHE_PCA = CACHE_DIR / "pca.pkl"
 CACHE_INFO = CACHE_DIR / "info.json"
+CACHE_EMBED_STORE = CACHE_DIR / "chunk_embeddings.sqlite"
+CACHE_PDF_EXTRACT = CACHE_DIR / "pdf_extract.sqlite"
+
+
+def _embed_store_enabled() -> bool:
+    return os.getenv("RAG_EMBED_STORE", "true").lower() in ("1", "true", "yes")
+
+
+def _pdf_extract_cache_enabled() -> bool:
+    return os.getenv("RAG_PDF_EXTRACT_CACHE", "true").lower() in ("1", "true", "yes")
+
+
+def _content_version(chunks: List[str]) -> str:
+    """청크 텍스트 + 임베딩 설정 해시. 같은 문서로 다시 빌드하면 같은 값."""
+    h = hashlib.sha256(json.dumps(_get_embedding_signature(), sort_keys=True).encode("utf-8"))
+    for chunk in chunks:
+        h.update(b"\x00")
+        h.update(chunk.encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _set_index_version(content_version: str, index_config: Optional[Dict[str, Any]]) -> None:
+    # 인덱스 종류/검색 파라미터가 바뀌면 검색 결과도 달라지므로 버전에 포함
+    _rag_system["content_version"] = content_version
+    _rag_system["index_version"] = text_hash(f"{content_version}:{json.dumps(index_config, sort_keys=True)}")
+
+
+def get_index_version() -> Optional[str]:
+    """응답 캐시 키에 쓰는 현재 RAG 인덱스 버전 (미초기화 시 None)."""
+    return _rag_system["index_version"] if _rag_system["initialized"] else None
+
+
+CACHE_CHUNKS_STORE = CACHE_DIR / "chunks"
+CACHE_META_STORE = CACHE_DIR / "metadatas"
+
+
+def _binary_cache_exists() -> bool:
+    return store_exists(CACHE_CHUNKS_STORE) and columns_exist(CACHE_META_STORE)
 
 
 def _cache_exists() -> bool:
-    return CACHE_EMB.exists() and CACHE_CHUNKS.exists() and CACHE_META.exists()
+    if not CACHE_EMB.exists():
+        return False
+    # 바이너리 캐시는 info.json을 마지막에 쓰므로, info.json이 없으면 저장이 중간에 끊긴 캐시
+    if _binary_cache_exists():
+        return CACHE_INFO.exists()
+    # chunks.json/metadatas.json은 이전 버전 캐시 호환용
+    return CACHE_CHUNKS.exists() and CACHE_META.exists()
+
 
+def _cache_load_mode() -> str:
+    """eager: 전체를 메모리로 읽음 / mmap: 임베딩과 청크를 mmap 후 조회 시 지연 로드."""
+    mode = os.getenv("RAG_CACHE_LOAD_MODE", "eager").lower()
+    return mode if mode in ("eager", "mmap") else "eager"
 
-def _load_cache() -> bool:
+
+def _read_faiss_index(mmap_mode: bool):
+    if mmap_mode and hasattr(faiss, "IO_FLAG_MMAP"):
+        try:
+            return faiss.read_index(str(CACHE_INDEX), faiss.IO_FLAG_MMAP)
+        except Exception as e:
+            logger.info(f"FAISS mmap load not supported for this index, reading fully: {e}")
+    return faiss.read_index(str(CACHE_INDEX))
+
+
+def _load_cache(check_signature: bool = False, check_embedding: bool = True) -> bool:
     if not _cache_exists():
         return False
 
     try:
-        emb_norm = np.load(CACHE_EMB)
-        with CACHE_CHUNKS.open("r", encoding="utf-8") as f:
-            chunks = json.load(f)
-        with CACHE_META.open("r", encoding="utf-8") as f:
-            metadatas = json.load(f)
+        info: Dict[str, Any] = {}
+        if CACHE_INFO.exists():
+            with CACHE_INFO.open("r", encoding="utf-8") as f:
+                info = json.load(f)
+        if check_signature and check_embedding and CACHE_INFO.exists():
+            cached_signature = info.get("embedding")
+            current_signature = _get_embedding_signature()
+            if current_signature is not None and cached_signature != current_signature:
+                # 풀링/토큰 상한이 바뀌면 쿼리 벡터와 인덱스 벡터가 어긋나므로 재구축
+                print(f"  ⚠️ 임베딩 설정 변경 감지 ({cached_signature} → {current_signature}) - 캐시 재구축")
+                return False
+
+        load_mode = _cache_load_mode()
+        use_mmap = load_mode == "mmap"
+        if _binary_cache_exists():
+            emb_norm = np.load(CACHE_EMB, mmap_mode="r" if use_mmap else None)
+            chunks = TextStore(CACHE_CHUNKS_STORE, use_mmap=use_mmap)
+            metadatas = MetadataColumns.load(CACHE_META_STORE, use_mmap=use_mmap)
+        else:
+            if use_mmap:
+                print("  ⚠️ 바이너리 청크 저장소 없음 - eager 로드로 대체")
+            load_mode = "eager"
+            emb_norm = np.load(CACHE_EMB)
+            with CACHE_CHUNKS.open("r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            with CACHE_META.open("r", encoding="utf-8") as f:
+                metadatas = MetadataColumns.from_records(json.load(f))
         pca = None
         if CACHE_PCA.exists():
             with CACHE_PCA.open("rb") as f:
@@ -181,8 +341,20 @@ def _load_cache() -> bool:
 
         index = None
         use_faiss = False
+        index_config = info.get("index") or {"type": "flat"}
         if _FAISS_AVAILABLE and CACHE_INDEX.exists():
-            index = faiss.read_index(str(CACHE_INDEX))
+            wanted_type = get_index_config()["type"]
+            if check_signature and wanted_type != index_config.get("type"):
+                # 임베딩은 그대로 두고 인덱스만 새 종류로 다시 구축
+                print(f"  🔁 인덱스 종류 변경 ({index_config.get('type')} → {wanted_type}) - 인덱스만 재구축")
+                index, index_config = build_index(emb_norm, get_index_config())
+                _write_faiss_index(index)
+                info["index"] = index_config
+                with atomic_write(CACHE_INFO, "w", encoding="utf-8") as f:
+                    json.dump(info, f, ensure_ascii=False)
+            else:
+                index = _read_faiss_index(load_mode == "mmap")
+                index_config = apply_search_params(index, index_config)
             use_faiss = True
 
         dim = emb_norm.shape[1] if emb_norm.size else None
@@ -195,14 +367,32 @@ def _load_cache() -> bool:
         _rag_system["original_dimension"] = pca.n_features_ if pca is not None else dim
         _rag_system["initialized"] = True
         _rag_system["use_faiss"] = use_faiss
-        print("  ✅ RAG cache loaded from disk")
+        _rag_system["index_config"] = index_config if use_faiss else None
+        content_version = info.get("content_version")
+        if not content_version:
+            # content_version 이전 캐시: 임베딩 파일 크기/수정 시각으로 대체
+            stat = CACHE_EMB.stat()
+            content_version = text_hash(f"{stat.st_size}:{stat.st_mtime_ns}")
+        _set_index_version(content_version, _rag_system["index_config"])
+        _reset_query_cache()
+        print(f"  ✅ RAG cache loaded from disk (mode: {load_mode}, index: {index_config.get('type') if use_faiss else 'numpy'})")
         return True
     except Exception as e:
         logger.warning(f"Failed to load RAG cache: {e}")
         return False
 
 
+def _write_faiss_index(index) -> None:
+    # 임시 파일에 쓴 뒤 교체 (mmap 중인 기존 인덱스 파일을 덮어쓰지 않음)
+    with atomic_path(CACHE_INDEX) as tmp:
+        faiss.write_index(index, tmp)
+
+
 def _save_cache() -> None:
+    """
+    각 파일을 임시 파일에 쓰고 os.replace로 교체. info.json은 먼저 지우고 맨 마지막에 씀
+    (중간에 실패하면 info.json이 없어 _cache_exists()가 False → 다음 시작 시 재구축).
+    """
     try:
         CACHE_DIR.mkdir(parents=True, exist_ok=True)
         emb_norm = _rag_system.get("embeddings_norm")
@@ -213,21 +403,33 @@ def _save_cache() -> None:
         if emb_norm is None:
             return
 
-        np.save(CACHE_EMB, emb_norm)
-        with CACHE_CHUNKS.open("w", encoding="utf-8") as f:
-            json.dump(chunks, f, ensure_ascii=False)
-        with CACHE_META.open("w", encoding="utf-8") as f:
-            json.dump(metadatas, f, ensure_ascii=False)
+        if CACHE_INFO.exists():
+            CACHE_INFO.unlink()
+        save_array(CACHE_EMB, emb_norm)
+        write_text_store(CACHE_CHUNKS_STORE, list(chunks))
+        if not isinstance(metadatas, MetadataColumns):
+            metadatas = MetadataColumns.from_records(list(metadatas))
+        metadatas.save(CACHE_META_STORE)
+        # 이전 형식(JSON) 캐시 파일은 제거
+        for legacy in (CACHE_CHUNKS, CACHE_META):
+            if legacy.exists():
+                legacy.unlink()
         if pca is not None:
-            with CACHE_PCA.open("wb") as f:
+            with atomic_write(CACHE_PCA) as f:
                 pickle.dump(pca, f)
+        elif CACHE_PCA.exists():
+            # 이전 빌드의 PCA가 새 임베딩에 적용되지 않도록 제거
+            CACHE_PCA.unlink()
         if _FAISS_AVAILABLE and _rag_system.get("index") is not None:
-            faiss.write_index(_rag_system["index"], str(CACHE_INDEX))
-        with CACHE_INFO.open("w", encoding="utf-8") as f:
+            _write_faiss_index(_rag_system["index"])
+        with atomic_write(CACHE_INFO, "w", encoding="utf-8") as f:
             json.dump(
                 {
                     "dimension": _rag_system.get("dimension"),
                     "use_faiss": _rag_system.get("use_faiss", False),
+                    "embedding": _get_embedding_signature(),
+                    "index": _rag_system.get("index_config"),
+                    "content_version": _rag_system.get("content_version"),
                 },
                 f,
                 ensure_ascii=False,
@@ -249,8 +451,10 @@ if _notice_cache_path.exists():
 if not STATIC_TEXT:
     STATIC_TEXT = "Static manual not available."
 
-def create_rag_prompt(language: str = "ko") -> PromptTemplate:
+def create_rag_prompt(language: str = "ko") -> "PromptTemplate":
     """RAG prompt."""
+    from langchain_core.prompts import PromptTemplate
+
     if language == "ko":
         template = _load_text_file(
             "rag_prompt_ko.txt",
@@ -278,25 +482,206 @@ Answer:"""
     return PromptTemplate(template=template, input_variables=["context", "question"])
 
 
-def generate_rag_response(query: str, language: str = "ko", k: int = 5) -> Dict[str, Any]:
-    """RAG response."""
-    docs = retrieve_documents(query, k=k)
+def _rag_allow_sampled() -> bool:
+    """
+    RAG 답변(temperature 0.3)을 캐시에 저장/재사용할지. 문서에 근거한 답변이라 기본 허용
+    (RAG_CACHE_ALLOW_SAMPLED=false이면 RAG 응답 캐시를 쓰지 않음).
+    """
+    return os.getenv("RAG_CACHE_ALLOW_SAMPLED", "true").lower() in ("1", "true", "yes")
+
+
+def _rag_sampling_cacheable() -> bool:
+    """응답 캐시와 의미 캐시가 같은 기준으로 RAG 답변 재사용 여부를 판단."""
+    return _rag_allow_sampled() or float(RAG_SAMPLING.get("temperature") or 0) <= 0
+
+
+def _response_cache_key(query: str, language: str, k: int) -> Optional[str]:
+    """응답 캐시를 쓸 수 없는 요청(비활성/샘플링/미초기화)이면 None."""
+    cache = get_response_cache()
+    if (
+        cache is None
+        or not _rag_system["initialized"]
+        or not cache.accepts(RAG_SAMPLING, allow_sampled=_rag_allow_sampled())
+    ):
+        return None
+    return response_cache_key(
+        kind="rag",
+        # 검색/생성에 쓰는 질문 그대로 (정규화하면 다른 입력의 응답을 돌려줄 수 있음)
+        prompt=query,
+        language=language,
+        index_version=get_index_version(),
+        template=text_hash(create_rag_prompt(language).template),
+        sampling=RAG_SAMPLING,
+        k=k,
+    )
+
+
+def _cached_response(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    if key is None:
+        return None
+    cached = get_response_cache().get(key)
+    return dict(cached, cache_hit=True, cache_type="exact") if cached is not None else None
+
+
+def _semantic_bucket(language: str, k: int) -> str:
+    # 템플릿/샘플링/k가 다르면 답변이 달라지므로 별도 버킷
+    variant = json.dumps([create_rag_prompt(language).template, RAG_SAMPLING, k], sort_keys=True, ensure_ascii=False)
+    return f"{language}:{text_hash(variant)}"
+
+
+def _semantic_vectors(queries: List[str]) -> Optional[np.ndarray]:
+    """
+    의미 캐시용 쿼리 벡터 (검색과 같은 벡터라 쿼리 임베딩 캐시를 공유). 사용할 수 없으면 None.
+    None이면 조회와 저장을 모두 건너뜀 (응답 캐시와 같은 샘플링 기준 적용).
+    """
+    if (
+        get_semantic_cache() is None
+        or not _rag_system["initialized"]
+        or not queries
+        or not _rag_sampling_cacheable()
+    ):
+        return None
+    embedding_model = _get_embedding_model()
+    if not embedding_model:
+        # 해시 임베딩은 의미 유사도를 나타내지 않음
+        return None
+    try:
+        return _embed_queries(list(queries), embedding_model)
+    except Exception as e:
+        logger.warning(f"Semantic cache embedding failed: {e}")
+        return None
+
+
+def _semantic_response(vector: Optional[np.ndarray], language: str, k: int) -> Optional[Dict[str, Any]]:
+    if vector is None:
+        return None
+    found = get_semantic_cache().lookup(vector, _semantic_bucket(language, k), get_index_version())
+    if found is None:
+        return None
+    response, score, matched = found
+    return dict(response, cache_hit=True, cache_type="semantic", cache_similarity=round(score, 4), cache_matched_prompt=matched)
+
+
+def _store_response(
+    key: Optional[str],
+    response: Dict[str, Any],
+    query: str = "",
+    vector: Optional[np.ndarray] = None,
+    k: int = 5,
+) -> Dict[str, Any]:
+    # LLM이 생성한 답변만 저장 (문서 없음/모델 미로딩 응답은 저장하지 않음)
+    if response.get("source") == "rag_llm" and not response.get("error"):
+        if key is not None:
+            get_response_cache().put(key, response)
+        if vector is not None:
+            get_semantic_cache().add(
+                vector, query, response, _semantic_bucket(response.get("language", "ko"), k), get_index_version()
+            )
+    return dict(response, cache_hit=False)
+
+
+def generate_rag_response(
+    query: str,
+    language: str = "ko",
+    k: int = 5,
+    documents: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """
+    RAG response.
+    같은 질문/인덱스 버전/템플릿이면 응답 캐시, 비슷한 질문이면 의미 캐시에서 반환 (cache_hit/cache_type).
+    documents를 넘기면 (미리 검색한 결과) 검색을 생략.
+    """
+    key = _response_cache_key(query, language, k)
+    cached = _cached_response(key)
+    if cached is not None:
+        return cached
+    vectors = _semantic_vectors([query])
+    vector = vectors[0] if vectors is not None else None
+    cached = _semantic_response(vector, language, k)
+    if cached is not None:
+        return cached
+    docs = documents if documents is not None else retrieve_documents(query, k=k)
+    return _store_response(key, _generate_from_documents(query, docs, language), query, vector, k)
+
+
+def generate_rag_response_many(
+    queries: List[str],
+    language: str = "ko",
+    k: int = 5,
+    priority: int = PRIORITY_BATCH,
+) -> List[Dict[str, Any]]:
+    """
+    여러 질문에 대한 RAG 응답. 캐시에 없는 질문만 한 번에 검색하고 질문별로 생성 (입력 순서 유지).
+    LLM 큐가 가득 차거나 대기 시간이 초과된 질문은 {"error": "busy", "retry_after": n}으로 두고 나머지를 계속 처리.
+    """
+    keys = [_response_cache_key(query, language, k) for query in queries]
+    results: List[Optional[Dict[str, Any]]] = [_cached_response(key) for key in keys]
+    pending = [i for i, result in enumerate(results) if result is None]
+
+    vectors: Dict[int, np.ndarray] = {}
+    q_mat = _semantic_vectors([queries[i] for i in pending])
+    if q_mat is not None:
+        vectors = dict(zip(pending, q_mat))
+        for i in pending:
+            results[i] = _semantic_response(vectors[i], language, k)
+        pending = [i for i in pending if results[i] is None]
+
+    docs_per_query = retrieve_documents_many([queries[i] for i in pending], k=k)
+    for i, docs in zip(pending, docs_per_query):
+        try:
+            generated = _generate_from_documents(queries[i], docs, language, priority=priority)
+        except (SchedulerBusyError, DeadlineExceededError) as e:
+            results[i] = {"error": "busy", "retry_after": e.retry_after, "language": language}
+            continue
+        results[i] = _store_response(keys[i], generated, queries[i], vectors.get(i), k)
+    return results
+
+
+# RAG 답변 생성 파라미터. 응답 속도 개선: max_tokens를 256으로 제한 (512 → 256)
+RAG_SAMPLING = {
+    "max_tokens": 256,
+    "temperature": 0.3,
+    "top_p": 0.9,
+    "repeat_penalty": 1.1,
+}
+
+
+def _not_found_response(language: str) -> Dict[str, Any]:
+    not_found_ko = _load_text_file(
+        "rag_not_found_ko.txt",
+        fallback="No matching documents found. Please contact the admin office (031-696-8803).",
+    )
+    return {
+        "response": not_found_ko if language == "ko" else "No documents found.",
+        "source": "none",
+        "language": language,
+    }
+
+
+def _rag_prompt_prefix(prompt: "PromptTemplate") -> str:
+    """템플릿에서 {context} 앞의 고정 지시문 (언어별로 동일하므로 KV 상태 재사용 대상)."""
+    return prompt.template.split("{context}", 1)[0]
+
+
+def _format_rag_prompt(query: str, docs: List[Dict[str, Any]], language: str) -> Tuple[str, str, str]:
+    with span("rag.prompt_format", docs=len(docs)):
+        context = "\n\n".join([d["content"] for d in docs])
+        if language == "ko":
+            context = _clean_context_ko(context)
+        prompt = create_rag_prompt(language)
+        return prompt.format(context=context, question=query), context, _rag_prompt_prefix(prompt)
+
+
+def _generate_from_documents(
+    query: str,
+    docs: List[Dict[str, Any]],
+    language: str = "ko",
+    priority: int = PRIORITY_INTERACTIVE,
+) -> Dict[str, Any]:
     if not docs:
-        not_found_ko = _load_text_file(
-            "rag_not_found_ko.txt",
-            fallback="No matching documents found. Please contact the admin office (031-696-8803).",
-        )
-        return {
-            "response": not_found_ko if language == "ko" else "No documents found.",
-            "source": "none",
-            "language": language,
-        }
+        return _not_found_response(language)
 
-    context = "\n\n".join([d["content"] for d in docs])
-    if language == "ko":
-        context = _clean_context_ko(context)
-    prompt = create_rag_prompt(language)
-    formatted = prompt.format(context=context, question=query)
+    formatted, context, prefix = _format_rag_prompt(query, docs, language)
 
     model = _get_llm_model()
     if not model:
@@ -307,15 +692,7 @@ def generate_rag_response(query: str, language: str = "ko", k: int = 5) -> Dict[
             "language": language,
         }
 
-    # 응답 속도 개선: max_tokens를 256으로 제한 (512 → 256)
-    output = model(
-        formatted,
-        max_tokens=256,  # 응답 속도 2배 향상
-        temperature=0.3,
-        top_p=0.9,
-        repeat_penalty=1.1,
-        echo=False,
-    )
+    output = run_completion(formatted, RAG_SAMPLING, priority=priority, prefix=prefix)
 
     response_text = output["choices"][0]["text"].strip()
     tokens_used = output.get("usage", {}).get("completion_tokens", 0)
@@ -329,6 +706,38 @@ def generate_rag_response(query: str, language: str = "ko", k: int = 5) -> Dict[
     }
 
 
+def stream_rag_response(
+    query: str,
+    language: str = "ko",
+    k: int = 5,
+    documents: Optional[List[Dict[str, Any]]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    RAG 응답 스트리밍. {"event", "data"} 형태로
+    documents(검색 결과) → token(생성되는 대로) → done(tokens_used/source) 순서로 yield.
+    """
+    started = time.perf_counter()
+    docs = documents if documents is not None else retrieve_documents(query, k=k)
+    yield {"event": "documents", "data": {"documents": docs}}
+
+    if not docs:
+        resp = _not_found_response(language)
+        yield {"event": "token", "data": {"text": resp["response"]}}
+        yield {"event": "done", "data": {"source": "none", "tokens_used": 0, "language": language}}
+        return
+
+    formatted, context, prefix = _format_rag_prompt(query, docs, language)
+    model = _get_llm_model()
+    if not model:
+        yield {"event": "token", "data": {"text": context[:1000] + "..."}}
+        yield {"event": "done", "data": {"source": "rag_document", "tokens_used": 0, "language": language}}
+        return
+
+    yield from stream_completion(
+        formatted, RAG_SAMPLING, started, prefix=prefix, source="rag_llm", language=language
+    )
+
+
 def _load_pdfs(pdf_paths: Optional[List[Path]] = None, include_static: bool = True) -> Tuple[List[str], List[Dict[str, Any]]]:
 
     """PDF들을 페이지 단위로 읽어 텍스트와 메타데이터 반환. 필요 시 STATIC_TEXT도 포함."""
@@ -400,83 +809,92 @@ def _load_pdfs(pdf_paths: Optional[List[Path]] = None, include_static: bool = Tr
 
 
     print(f"  📖 PDF 파일 읽는 중...")
-    pdf_page_count = 0
-    for pdf_path in targets:
+    chandra_enabled = os.getenv("CHANDRA_PDF_ENABLED", "false").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+    chandra_method = os.getenv("CHANDRA_METHOD", "hf")
 
-        try:
-            chandra_enabled = os.getenv("CHANDRA_PDF_ENABLED", "false").lower() in (
-                "1",
-                "true",
-                "yes",
-            )
-            chandra_method = os.getenv("CHANDRA_METHOD", "hf")
-            chandra_texts = []
-            if chandra_enabled and _CHANDRA_AVAILABLE:
+    # PDF -> (페이지 텍스트 목록, 추출기). Chandra OCR(GPU 모델)은 순차, 나머지는 pypdf 페이지 단위 병렬 추출.
+    # 추출 캐시: (파일 내용 해시, 추출기, 버전/방식)이 같으면 다시 추출하지 않음
+    extracted: Dict[Path, Tuple[List[Optional[str]], str]] = {}
+    cache = PdfExtractCache(CACHE_PDF_EXTRACT) if _pdf_extract_cache_enabled() else None
+    file_hashes = {p: file_sha256(p) for p in targets} if cache is not None else {}
+    cache_hits = 0
+
+    def cache_key(pdf_path: Path, extractor: str, version: str) -> Optional[str]:
+        file_hash = file_hashes.get(pdf_path)
+        return PdfExtractCache.key(file_hash, extractor, version) if file_hash else None
+
+    try:
+        if chandra_enabled and _CHANDRA_AVAILABLE:
+            chandra_version = extractor_version("chandra", chandra_method)
+            for pdf_path in targets:
+                key = cache_key(pdf_path, "chandra", chandra_version)
+                cached = cache.get(key) if key else None
+                if cached is not None:
+                    cache_hits += 1
+                    print(f"     - {pdf_path.name}: Chandra OCR 캐시 사용 ({len(cached)}페이지)")
+                    extracted[pdf_path] = (cached, "chandra")
+                    continue
                 print(f"     - {pdf_path.name}: Chandra OCR 시도 중...")
                 chandra_texts = _extract_pdf_text_chandra(pdf_path, chandra_method)
                 if chandra_texts:
                     print(f"     - {pdf_path.name}: Chandra OCR {len(chandra_texts)}페이지 추출")
-                    for page_idx, page_text in enumerate(chandra_texts):
-                        page_text = page_text.replace("\x00", " ").strip()
-                        if not page_text:
-                            continue
-                        texts.append(page_text)
-                        pdf_page_count += 1
-                        metas.append(
-                            {
-                                "file": pdf_path.name,
-                                "path": str(pdf_path),
-                                "page": page_idx + 1,
-                                "source": "chandra",
-                            }
-                        )
-                    continue
+                    extracted[pdf_path] = (chandra_texts, "chandra")
+                    if key:
+                        cache.put(key, pdf_path, "chandra", chandra_texts)
 
+        remaining = [p for p in targets if p not in extracted]
+        if remaining:
             if PdfReader is None:
-                print(f"     - {pdf_path.name}: pypdf 사용 불가, PDF 추출 건너뜀")
-                continue
-            reader = PdfReader(str(pdf_path))
-            num_pages = len(reader.pages)
-            print(f"     - {pdf_path.name}: {num_pages}페이지")
-
-            for page_idx, page in enumerate(reader.pages):
-
-                try:
-
-                    raw = page.extract_text() or ""
-
-                except Exception:
-
-                    raw = ""
-
-                raw = raw.replace("\x00", " ").strip()
-
-                if not raw:
-
-                    continue
-
-                texts.append(raw)
-                pdf_page_count += 1
-
-                metas.append(
-
-                    {
-
-                        "file": pdf_path.name,
-
-                        "path": str(pdf_path),
-
-                        "page": page_idx + 1,
-
-                    }
-
-                )
-
-        except Exception as e:
-            print(f"  ❌ PDF 읽기 실패 ({pdf_path.name}): {e}")
-            logger.error(f"Failed to read {pdf_path}: {e}")
-
+                for pdf_path in remaining:
+                    print(f"     - {pdf_path.name}: pypdf 사용 불가, PDF 추출 건너뜀")
+            else:
+                pypdf_version = extractor_version("pypdf")
+                keys = {p: cache_key(p, "pypdf", pypdf_version) for p in remaining}
+                to_extract = []
+                for pdf_path in remaining:
+                    cached = cache.get(keys[pdf_path]) if keys[pdf_path] else None
+                    if cached is not None:
+                        cache_hits += 1
+                        print(f"     - {pdf_path.name}: 추출 캐시 사용 ({len(cached)}페이지)")
+                        extracted[pdf_path] = (cached, "pypdf")
+                    else:
+                        to_extract.append(pdf_path)
+                if to_extract:
+                    for pdf_path, page_texts in extract_pdf_pages(to_extract).items():
+                        extracted[pdf_path] = (page_texts, "pypdf")
+                        # 시간 초과 페이지(None)가 있으면 다음 빌드에서 다시 시도하도록 저장하지 않음
+                        if keys[pdf_path] and None not in page_texts:
+                            cache.put(keys[pdf_path], pdf_path, "pypdf", page_texts)
+    finally:
+        if cache is not None:
+            cache.close()
+    if cache is not None:
+        print(f"  🗂️ PDF 추출 캐시: 적중 {cache_hits}개, 신규 추출 {len(targets) - cache_hits}개")
+
+    # 완료 순서와 무관하게 입력 PDF 순서 / 페이지 순서로 조립
+    pdf_page_count = 0
+    for pdf_path in targets:
+        if pdf_path not in extracted:
             continue
+        page_texts, extractor = extracted[pdf_path]
+        for page_idx, page_text in enumerate(page_texts):
+            page_text = (page_text or "").replace("\x00", " ").strip()
+            if not page_text:
+                continue
+            texts.append(page_text)
+            pdf_page_count += 1
+            meta = {
+                "file": pdf_path.name,
+                "path": str(pdf_path),
+                "page": page_idx + 1,
+            }
+            if extractor == "chandra":
+                meta["source"] = "chandra"
+            metas.append(meta)
 
     print(f"  ✅ PDF에서 {pdf_page_count}개 페이지 추출 완료")
 
@@ -569,9 +987,15 @@ def _build_embeddings(
 
     print(f"  🧮 임베딩 생성 중 ({len(all_chunks)}개 청크)...")
     if embedding_model:
-        emb_matrix = embedding_model.encode(
-            all_chunks, convert_to_numpy=True, show_progress_bar=False
-        )
+        if _embed_store_enabled():
+            # 청크 텍스트+임베딩 설정 해시로 이전 빌드의 벡터를 재사용하고 바뀐 청크만 인코딩
+            emb_matrix = encode_with_store(
+                embedding_model, all_chunks, _get_embedding_signature(), CACHE_EMBED_STORE
+            )
+        else:
+            emb_matrix = embedding_model.encode(
+                all_chunks, convert_to_numpy=True, show_progress_bar=False
+            )
         # sentence-transformers returns ndarray; HF wrapper returns list of arrays
         if isinstance(emb_matrix, list):
             emb_matrix = np.vstack(emb_matrix)
@@ -622,12 +1046,57 @@ def _build_embeddings(
 
 
 
-def initialize_rag_system(pdf_paths: Optional[List[str]] = None, target_dim: int = 256) -> bool:
-    """PDF를 읽어 벡터 인덱스를 구성."""
+def rag_build_on_start() -> bool:
+    """캐시가 없거나 맞지 않을 때 시작 시 인덱스를 빌드할지 (gunicorn preload에서는 false로 강제)."""
+    return os.getenv("RAG_BUILD_ON_START", "true").lower() in ("1", "true", "yes")
+
+
+def load_rag_cache(verify_embedding: bool = True) -> bool:
+    """
+    디스크 캐시만 로드 (없거나 실패하면 구축하지 않고 False).
+    verify_embedding=False: 임베딩 모델 로드 전에 먼저 읽어 둘 때 사용. 모델 로드 후 cache_signature_matches로 확인.
+    RAG_BUILD_ON_START=false이면 인덱스 종류가 달라도 FAISS 인덱스를 다시 만들지 않고 저장된 인덱스를 그대로 사용.
+    """
+    cache_mode = os.getenv("RAG_CACHE_MODE", "auto").lower()
+    if cache_mode not in ("auto", "load") or not _cache_exists():
+        return False
+    return _load_cache(
+        check_signature=cache_mode == "auto" and rag_build_on_start(),
+        check_embedding=verify_embedding,
+    )
+
+
+def cache_signature_matches() -> bool:
+    """
+    로드된 캐시의 임베딩 설정이 현재 임베딩 모델과 같은지.
+    임베딩 모델보다 캐시를 먼저 로드한 경우(백그라운드 로딩) 모델 로드 후 확인용.
+    """
+    if os.getenv("RAG_CACHE_MODE", "auto").lower() != "auto" or not CACHE_INFO.exists():
+        return True
+    current_signature = _get_embedding_signature()
+    if current_signature is None:
+        return True
+    with CACHE_INFO.open("r", encoding="utf-8") as f:
+        cached_signature = json.load(f).get("embedding")
+    return cached_signature == current_signature
+
+
+def unload_rag_system() -> None:
+    """재구축 동안 이전 인덱스로 검색하지 않도록 비활성화."""
+    _rag_system["initialized"] = False
+    _reset_query_cache()
+
+
+def initialize_rag_system(
+    pdf_paths: Optional[List[str]] = None,
+    target_dim: int = 256,
+    rebuild: bool = False,
+) -> bool:
+    """PDF를 읽어 벡터 인덱스를 구성. rebuild=True이면 캐시를 무시하고 다시 구축."""
     try:
         cache_mode = os.getenv("RAG_CACHE_MODE", "auto").lower()
-        if cache_mode in ("auto", "load") and _cache_exists():
-            if _load_cache():
+        if not rebuild and cache_mode in ("auto", "load") and _cache_exists():
+            if _load_cache(check_signature=cache_mode == "auto"):
                 return True
 
         print("  📄 PDF 문서 로딩 중...")
@@ -661,17 +1130,18 @@ def initialize_rag_system(pdf_paths: Optional[List[str]] = None, target_dim: int
 
         dim = emb_norm.shape[1]
         index = None
+        index_config = None
         if _FAISS_AVAILABLE:
-            print(f"  🔍 FAISS 인덱스 구축 중 (차원: {dim})...")
-            index = faiss.IndexFlatIP(dim)
-            index.add(emb_norm)
-            print(f"  ✅ FAISS 인덱스 구축 완료")
+            index_config = get_index_config()
+            print(f"  🔍 FAISS 인덱스 구축 중 (차원: {dim}, 종류: {index_config['type']})...")
+            index, index_config = build_index(emb_norm, index_config)
+            print(f"  ✅ FAISS 인덱스 구축 완료 ({index_config})")
         else:
             print(f"  ⚠️ FAISS 사용 불가 - numpy 검색 사용 (차원: {dim})")
 
         _rag_system["index"] = index
         _rag_system["embeddings_norm"] = emb_norm
-        _rag_system["metadatas"] = metadatas
+        _rag_system["metadatas"] = MetadataColumns.from_records(metadatas)
         _rag_system["chunks"] = chunks
         _rag_system["pca"] = pca
         _rag_system["dimension"] = dim
@@ -680,6 +1150,9 @@ def initialize_rag_system(pdf_paths: Optional[List[str]] = None, target_dim: int
         )
         _rag_system["initialized"] = True
         _rag_system["use_faiss"] = _FAISS_AVAILABLE
+        _rag_system["index_config"] = index_config
+        _set_index_version(_content_version(chunks), index_config)
+        _reset_query_cache()
 
         logger.info(f"RAG initialized: chunks={len(chunks)}, dim={dim}")
         print(f"  📊 RAG 시스템 통계:")
@@ -701,83 +1174,131 @@ def initialize_rag_system(pdf_paths: Optional[List[str]] = None, target_dim: int
 
 
 
-def retrieve_documents(query: str, k: int = 5) -> List[Dict[str, Any]]:
-    """쿼리로 상위 k개 문서 반환."""
-    if not _rag_system["initialized"]:
-        print(f"  ⚠️ RAG 미초기화 - 문서 검색 불가")
-        logger.warning("RAG system not initialized, cannot retrieve documents")
-        return []
-
-    print(f"  🔎 문서 검색: '{query}' (상위 {k}개)")
-
-
-
-    embedding_model = _get_embedding_model()
+def _query_model_id(embedding_model) -> str:
     if not embedding_model:
-        # Fallback to hash embeddings when no model is available.
-        embedding_model = None
-
-
-    try:
-
-        if embedding_model:
-            q_emb = embedding_model.encode([query], convert_to_numpy=True)
-            if isinstance(q_emb, list):
-                q_emb = np.array(q_emb[0])
+        return "hash"
+    signature = _get_embedding_signature() or {}
+    return signature.get("model") or type(embedding_model).__name__
+
+
+def _embed_queries(queries: List[str], embedding_model) -> np.ndarray:
+    """쿼리들 -> (PCA) -> 정규화 벡터 (n, dim). 캐시에 없는 쿼리만 한 번에 인코딩."""
+    model_id = _query_model_id(embedding_model)
+    # 인코딩하는 문자열 그대로를 키로 사용 (정규화하면 "Foo"/"foo"가 먼저 계산된 쪽 벡터를 공유하게 됨)
+    keys = [(q, model_id) for q in queries]
+    query_cache = _get_query_cache()
+    vectors: List[Optional[np.ndarray]] = [query_cache.get(key) for key in keys]
+
+    miss_positions: Dict[Tuple[str, str], List[int]] = {}
+    for pos, (key, vec) in enumerate(zip(keys, vectors)):
+        if vec is None:
+            miss_positions.setdefault(key, []).append(pos)
+
+    if miss_positions:
+        miss_queries = [queries[positions[0]] for positions in miss_positions.values()]
+        with span("rag.query_embed", queries=len(miss_queries)):
+            if embedding_model:
+                q_mat = _encode_queries(embedding_model, miss_queries)
             else:
-                q_emb = q_emb[0]
-        else:
-            q_emb = _simple_hash_embeddings([query], dim=_rag_system["dimension"] or 512)[0]
+                q_mat = _simple_hash_embeddings(miss_queries, dim=_rag_system["dimension"] or 512)
+        q_mat = np.asarray(q_mat)
         if _rag_system["pca"] is not None:
+            with span("rag.pca"):
+                q_mat = _rag_system["pca"].transform(q_mat)
+        q_mat = (q_mat / (np.linalg.norm(q_mat, axis=1, keepdims=True) + 1e-10)).astype("float32")
+        for row, (key, positions) in enumerate(miss_positions.items()):
+            q_emb = q_mat[row].copy()
+            q_emb.setflags(write=False)
+            query_cache.put(key, q_emb)
+            for pos in positions:
+                vectors[pos] = q_emb
 
-            q_emb = _rag_system["pca"].transform(q_emb.reshape(1, -1))[0]
+    return np.vstack(vectors)
 
-        q_emb = q_emb / (np.linalg.norm(q_emb) + 1e-10)
 
+def _embed_query(query: str, embedding_model) -> np.ndarray:
+    """쿼리 -> (PCA) -> 정규화 벡터. 동일한 쿼리는 캐시에서 반환."""
+    return _embed_queries([query], embedding_model)[0]
 
 
-        index = _rag_system["index"]
-        emb_norm = _rag_system["embeddings_norm"]
-        if _rag_system["use_faiss"] and index is not None:
-            scores, idxs = index.search(np.array([q_emb], dtype="float32"), k)
-            score_list = scores[0]
-            idx_list = idxs[0]
-        else:
-            if emb_norm is None or len(emb_norm) == 0:
-                return []
-            scores_all = emb_norm @ q_emb
-            k = min(k, scores_all.shape[0])
-            idx_list = np.argsort(-scores_all)[:k]
-            score_list = scores_all[idx_list]
-
-        results = []
-        for score, idx in zip(score_list, idx_list):
-            if idx < 0 or idx >= len(_rag_system["chunks"]):
-                continue
-            results.append(
+def get_query_cache_stats() -> Dict[str, Any]:
+    return _get_query_cache().get_stats()
 
-                {
 
-                    "content": _rag_system["chunks"][idx],
+def _search_index(q_mat: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """여러 쿼리를 한 번에 검색. FAISS가 없으면 numpy top-k 커널 사용."""
+    index = _rag_system["index"]
+    if _rag_system["use_faiss"] and index is not None:
+        with span("rag.index_search", backend="faiss", queries=len(q_mat)):
+            return index.search(np.ascontiguousarray(q_mat, dtype="float32"), k)
+    emb_norm = _rag_system["embeddings_norm"]
+    if emb_norm is None or len(emb_norm) == 0:
+        empty = np.empty((len(q_mat), 0))
+        return empty, empty.astype(np.int64)
+    with span("rag.index_search", backend="numpy", queries=len(q_mat)):
+        return topk_inner_product(emb_norm, q_mat, k)
 
-                    "metadata": _rag_system["metadatas"][idx],
 
-                    "score": float(score),
+def retrieve_documents_many(queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+    """
+    여러 쿼리의 상위 k개 문서를 한 번에 검색 (입력 순서대로 반환).
 
-                }
+    쿼리 임베딩 1회 배치 + 인덱스 1회 다중 검색. 여러 쿼리가 같은 청크를 가져오면
+    청크 텍스트/메타데이터는 한 번만 읽어 공유한다.
+    """
+    if not queries:
+        return []
+    if not _rag_system["initialized"]:
+        print(f"  ⚠️ RAG 미초기화 - 문서 검색 불가")
+        logger.warning("RAG system not initialized, cannot retrieve documents")
+        return [[] for _ in queries]
 
-            )
+    embedding_model = _get_embedding_model()
 
+    try:
+        q_mat = _embed_queries(list(queries), embedding_model)
+        scores, idxs = _search_index(q_mat, k)
+
+        n_chunks = len(_rag_system["chunks"])
+        shared: Dict[int, Tuple[str, Dict[str, Any]]] = {}
+        results: List[List[Dict[str, Any]]] = []
+        for score_row, idx_row in zip(scores, idxs):
+            docs = []
+            for score, idx in zip(score_row, idx_row):
+                idx = int(idx)
+                if idx < 0 or idx >= n_chunks:
+                    continue
+                if idx not in shared:
+                    shared[idx] = (_rag_system["chunks"][idx], _rag_system["metadatas"][idx])
+                content, metadata = shared[idx]
+                docs.append(
+                    {
+                        "content": content,
+                        "metadata": metadata,
+                        "score": float(score),
+                    }
+                )
+            results.append(docs)
         return results
 
     except Exception as e:
-
         logger.error(f"Document retrieval error: {e}")
+        return [[] for _ in queries]
 
-        return []
 
+def retrieve_documents(query: str, k: int = 5) -> List[Dict[str, Any]]:
+    """쿼리로 상위 k개 문서 반환."""
+    if _rag_system["initialized"]:
+        print(f"  🔎 문서 검색: '{query}' (상위 {k}개)")
+    return retrieve_documents_many([query], k=k)[0]
 
 
+def evaluate_index(k: int = 5, n_queries: int = 200, index_types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """현재 코퍼스로 인덱스 종류별 recall@k(Flat 기준)와 p50/p99 검색 지연 측정."""
+    emb_norm = _rag_system.get("embeddings_norm")
+    if not _FAISS_AVAILABLE or emb_norm is None or len(emb_norm) == 0:
+        raise RuntimeError("RAG index not initialized or faiss unavailable")
+    return evaluate_index_types(emb_norm, k=k, n_queries=n_queries, index_types=index_types)
 
 
 def is_rag_initialized() -> bool:
@@ -0,0 +1,231 @@
+"""
+RAG 캐시용 바이너리 저장소
+
+- 청크 텍스트: <name>.bin (이어붙인 UTF-8) + <name>.idx.npy (int64 오프셋, 길이 n+1)
+- 메타데이터: 문자열 테이블 + int32 컬럼 행렬 (MetadataColumns)
+- mmap 로드 시 조회된 레코드만 디코딩 (여러 워커가 페이지 캐시를 공유)
+- 모든 파일은 임시 파일에 쓴 뒤 os.replace로 교체 (다른 프로세스가 mmap 중인 기존 파일을 덮어쓰지 않음)
+"""
+
+import json
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+
+
+def _paths(prefix: Path):
+    prefix = Path(prefix)
+    return prefix.with_name(prefix.name + ".bin"), prefix.with_name(prefix.name + ".idx.npy")
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[str]:
+    """
+    같은 디렉터리의 임시 파일 경로를 yield 하고, 정상 종료 시 os.replace로 교체.
+    기존 파일의 inode는 그대로 남으므로 이를 mmap 중인 프로세스는 이전 내용을 계속 읽음.
+    """
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    os.close(fd)
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+@contextmanager
+def atomic_write(path: Path, mode: str = "wb", **kwargs: Any) -> Iterator[Any]:
+    """atomic_path의 파일 객체 버전."""
+    with atomic_path(path) as tmp:
+        with open(tmp, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def save_array(path: Path, array: np.ndarray) -> None:
+    # 파일 객체로 저장해야 np.save가 임시 파일 이름에 .npy를 붙이지 않음
+    with atomic_write(path) as f:
+        np.save(f, array)
+
+
+def store_exists(prefix: Path) -> bool:
+    data_path, idx_path = _paths(prefix)
+    return data_path.exists() and idx_path.exists()
+
+
+def write_text_store(prefix: Path, records: List[str]) -> None:
+    data_path, idx_path = _paths(prefix)
+    offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    with atomic_write(data_path) as f:
+        pos = 0
+        for i, record in enumerate(records):
+            raw = record.encode("utf-8")
+            f.write(raw)
+            pos += len(raw)
+            offsets[i + 1] = pos
+    save_array(idx_path, offsets)
+
+
+class TextStore:
+    """오프셋 인덱스로 레코드를 지연 디코딩하는 읽기 전용 시퀀스."""
+
+    def __init__(self, prefix: Path, use_mmap: bool = True):
+        data_path, idx_path = _paths(prefix)
+        self._offsets = np.load(idx_path, mmap_mode="r" if use_mmap else None)
+        size = int(self._offsets[-1]) if len(self._offsets) else 0
+        if use_mmap and size:
+            with data_path.open("rb") as f:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            # 빈 파일은 mmap 할 수 없으므로 바이트열로 대체
+            self._buf = data_path.read_bytes() if size else b""
+
+    def __len__(self) -> int:
+        return max(0, len(self._offsets) - 1)
+
+    def __getitem__(self, idx: int) -> str:
+        n = len(self)
+        if idx < 0:
+            idx += n
+        if idx < 0 or idx >= n:
+            raise IndexError(idx)
+        start = int(self._offsets[idx])
+        end = int(self._offsets[idx + 1])
+        return self._buf[start:end].decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+# =========================
+# 컬럼형 메타데이터
+# =========================
+# - <name>.cols.npy    : (n, 컬럼 수) int32 행렬. 문자열 컬럼은 문자열 테이블 id, 정수 컬럼은 값
+# - <name>.schema.json : 컬럼 이름/종류와 문자열 테이블 (file/path/section 등은 한 번씩만 저장)
+_MISSING = np.iinfo(np.int32).min
+_INT32_MAX = np.iinfo(np.int32).max
+
+
+class _Absent:
+    pass
+
+
+_ABSENT = _Absent()
+
+
+def _column_kind(values: List[Any]) -> str:
+    present = [v for v in values if v is not _ABSENT]
+    if present and all(
+        isinstance(v, int) and not isinstance(v, bool) and _MISSING < v <= _INT32_MAX for v in present
+    ):
+        return "int"
+    if all(isinstance(v, str) for v in present):
+        return "str"
+    return "json"
+
+
+def _schema_path(prefix: Path) -> Path:
+    prefix = Path(prefix)
+    return prefix.with_name(prefix.name + ".schema.json")
+
+
+def _cols_path(prefix: Path) -> Path:
+    prefix = Path(prefix)
+    return prefix.with_name(prefix.name + ".cols.npy")
+
+
+def columns_exist(prefix: Path) -> bool:
+    return _schema_path(prefix).exists() and _cols_path(prefix).exists()
+
+
+class MetadataColumns:
+    """청크별 메타데이터 dict 대신 컬럼 배열로 보관하고, 조회 시 dict를 재구성."""
+
+    def __init__(self, columns: List[Dict[str, Any]], matrix: np.ndarray):
+        self._columns = columns
+        self._matrix = matrix
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "MetadataColumns":
+        names: List[str] = []
+        for record in records:
+            for key in record:
+                if key not in names:
+                    names.append(key)
+
+        columns: List[Dict[str, Any]] = []
+        matrix = np.full((len(records), len(names)), _MISSING, dtype=np.int32)
+        for col, name in enumerate(names):
+            values = [record.get(name, _ABSENT) for record in records]
+            kind = _column_kind(values)
+            column: Dict[str, Any] = {"name": name, "kind": kind}
+            if kind == "int":
+                for row, v in enumerate(values):
+                    if v is not _ABSENT:
+                        matrix[row, col] = v
+            else:
+                table: List[str] = []
+                ids: Dict[str, int] = {}
+                for row, v in enumerate(values):
+                    if v is _ABSENT:
+                        continue
+                    item = v if kind == "str" else json.dumps(v, ensure_ascii=False)
+                    if item not in ids:
+                        ids[item] = len(table)
+                        table.append(item)
+                    matrix[row, col] = ids[item]
+                column["table"] = table
+            columns.append(column)
+        return cls(columns, matrix)
+
+    @classmethod
+    def load(cls, prefix: Path, use_mmap: bool = False) -> "MetadataColumns":
+        with _schema_path(prefix).open("r", encoding="utf-8") as f:
+            columns = json.load(f)["columns"]
+        matrix = np.load(_cols_path(prefix), mmap_mode="r" if use_mmap else None)
+        return cls(columns, matrix)
+
+    def save(self, prefix: Path) -> None:
+        with atomic_write(_schema_path(prefix), "w", encoding="utf-8") as f:
+            json.dump({"columns": self._columns}, f, ensure_ascii=False)
+        save_array(_cols_path(prefix), np.ascontiguousarray(self._matrix))
+
+    def __len__(self) -> int:
+        return int(self._matrix.shape[0])
+
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        n = len(self)
+        if idx < 0:
+            idx += n
+        if idx < 0 or idx >= n:
+            raise IndexError(idx)
+        row = self._matrix[idx]
+        record: Dict[str, Any] = {}
+        for col, column in enumerate(self._columns):
+            value = int(row[col])
+            if value == _MISSING:
+                continue
+            kind = column["kind"]
+            if kind == "int":
+                record[column["name"]] = value
+            elif kind == "str":
+                record[column["name"]] = column["table"][value]
+            else:
+                record[column["name"]] = json.loads(column["table"][value])
+        return record
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
@@ -0,0 +1,161 @@
+"""
+구성 요소(LLM / 임베딩 모델 / RAG 인덱스) 로딩 상태 추적과 병렬 로딩
+
+- 세 구성 요소를 각각 스레드에서 동시에 로드 (MODEL_LOAD_MODE=background 이면 서버가 먼저 포트를 엶)
+- RAG 디스크 캐시는 임베딩 모델을 기다리지 않고 먼저 읽고, 모델 로드 후 임베딩 설정이 다르면 재구축
+- 상태: idle → loading → ready | failed  (GET /ready)
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = ("llm", "embedding", "rag")
+
+
+class ComponentTracker:
+    def __init__(self, names=COMPONENTS):
+        self._lock = threading.Lock()
+        self._states: Dict[str, Dict[str, Any]] = {
+            name: {"state": "idle", "elapsed_s": None, "error": None} for name in names
+        }
+        self._started: Dict[str, float] = {}
+        self._done = {name: threading.Event() for name in names}
+
+    def mark_loading(self, name: str) -> None:
+        with self._lock:
+            self._states[name].update(state="loading", elapsed_s=None, error=None)
+            self._started[name] = time.monotonic()
+            self._done[name].clear()
+
+    def mark_done(self, name: str, ok: bool, error: Optional[str] = None) -> None:
+        with self._lock:
+            started = self._started.get(name, time.monotonic())
+            self._states[name].update(
+                state="ready" if ok else "failed",
+                elapsed_s=round(time.monotonic() - started, 2),
+                error=error,
+            )
+        self._done[name].set()
+
+    def wait(self, name: str, timeout: Optional[float] = None) -> bool:
+        return self._done[name].wait(timeout)
+
+    def state(self, name: str) -> str:
+        with self._lock:
+            return self._states[name]["state"]
+
+    def is_warming_up(self) -> bool:
+        """아직 로딩 중인 구성 요소가 있는지 (로딩을 시작하지 않은 경우는 제외)."""
+        with self._lock:
+            return any(info["state"] == "loading" for info in self._states.values())
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            result = {}
+            for name, info in self._states.items():
+                entry = dict(info)
+                if entry["state"] == "loading":
+                    entry["elapsed_s"] = round(time.monotonic() - self._started[name], 2)
+                result[name] = entry
+            return result
+
+
+_tracker = ComponentTracker()
+
+
+def get_component_tracker() -> ComponentTracker:
+    return _tracker
+
+
+def is_warming_up() -> bool:
+    return _tracker.is_warming_up()
+
+
+def get_readiness() -> Dict[str, Any]:
+    """ready: 모두 로드됨 / degraded: 로딩은 끝났지만 일부 실패 / loading / idle(로딩 시작 전)."""
+    components = _tracker.snapshot()
+    states = {info["state"] for info in components.values()}
+    if "loading" in states:
+        status = "loading"
+    elif "idle" in states:
+        status = "idle"
+    elif "failed" in states:
+        status = "degraded"
+    else:
+        status = "ready"
+    return {"status": status, "ready": status in ("ready", "degraded"), "components": components}
+
+
+def _run(name: str, loader: Callable[[], bool]) -> None:
+    try:
+        ok = bool(loader())
+        _tracker.mark_done(name, ok, None if ok else f"{name} not available")
+    except Exception as e:
+        logger.error(f"Failed to load {name}: {e}", exc_info=True)
+        _tracker.mark_done(name, False, str(e))
+
+
+def _load_llm() -> bool:
+    from src.models.model_manager import initialize_llm
+
+    return initialize_llm()
+
+
+def _load_embedding() -> bool:
+    from src.models.model_manager import initialize_embedding_model
+
+    return initialize_embedding_model()
+
+
+def _load_rag() -> bool:
+    from src.services.rag_service import (
+        cache_signature_matches,
+        initialize_rag_system,
+        load_rag_cache,
+        rag_build_on_start,
+        unload_rag_system,
+    )
+
+    # 디스크 캐시는 임베딩 모델과 무관하게 먼저 읽음 (모델 로딩과 병렬)
+    loaded = load_rag_cache(verify_embedding=False)
+    # 쿼리 임베딩/재구축에는 임베딩 모델이 필요
+    _tracker.wait("embedding")
+    if loaded and cache_signature_matches():
+        return True
+    if not rag_build_on_start():
+        # gunicorn preload: 마스터에서 빌드하지 않음 (LLM 폴백으로 동작)
+        print("  ⚠️ 사용할 수 있는 RAG 캐시가 없고 RAG_BUILD_ON_START=false - python build_rag_index.py 로 캐시를 만드세요")
+        if loaded:
+            unload_rag_system()
+        return False
+    if loaded:
+        print("  ⚠️ 임베딩 설정 변경 감지 - RAG 캐시 재구축")
+        unload_rag_system()
+        return initialize_rag_system(rebuild=True)
+    return initialize_rag_system()
+
+
+def start_component_loading(blocking: bool = False) -> List[threading.Thread]:
+    """LLM/임베딩/RAG 로딩 스레드 시작. blocking이면 모두 끝날 때까지 대기."""
+    loaders = {"llm": _load_llm, "embedding": _load_embedding, "rag": _load_rag}
+    threads = []
+    for name in COMPONENTS:
+        _tracker.mark_loading(name)
+    for name in COMPONENTS:
+        t = threading.Thread(target=_run, args=(name, loaders[name]), name=f"load-{name}", daemon=True)
+        t.start()
+        threads.append(t)
+    if blocking:
+        for t in threads:
+            t.join()
+    return threads
+
+
+def model_load_mode() -> str:
+    mode = os.getenv("MODEL_LOAD_MODE", "background").lower()
+    return mode if mode in ("background", "blocking") else "background"
@@ -0,0 +1,156 @@
+"""
+RAG/LLM 응답 캐시 (정확히 일치하는 질문)
+
+- 키: sha256(정규화 프롬프트, 언어, 인덱스 버전, 프롬프트 템플릿 해시, 샘플링 파라미터 등)
+- 프로세스 내 LRU + TTL, 선택적으로 SQLite에 저장해 재시작 후에도 유지
+- temperature > 0 인 요청은 매번 다른 답이 나올 수 있으므로 기본적으로 캐시하지 않음
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.services.lru_cache import LRUTTLCache
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def response_cache_key(**parts: Any) -> str:
+    """키 구성 요소(dict)를 정렬된 JSON으로 직렬화해 해시."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """LRU/TTL 메모리 캐시 + (옵션) SQLite 백업."""
+
+    def __init__(
+        self,
+        maxsize: int = 512,
+        ttl: Optional[float] = 86400,
+        path: Optional[Path] = None,
+        allow_sampled: bool = False,
+    ):
+        self._memory = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.allow_sampled = allow_sampled
+        self.disk_hits = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.path = Path(path) if path else None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def accepts(self, sampling: Dict[str, Any], allow_sampled: Optional[bool] = None) -> bool:
+        """
+        샘플링 설정상 캐시해도 되는 요청인지 (temperature > 0 이면 허용 설정 필요).
+        allow_sampled를 넘기면 전역 설정(RESPONSE_CACHE_ALLOW_SAMPLED) 대신 사용.
+        """
+        if allow_sampled is None:
+            allow_sampled = self.allow_sampled
+        if allow_sampled or float(sampling.get("temperature") or 0) <= 0:
+            return True
+        with self._lock:
+            self.bypassed += 1
+        return False
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._memory.get(key)
+        if value is not None or self._conn is None:
+            return value
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and row[1] + self.ttl < time.time():
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self.disk_hits += 1
+        value = json.loads(row[0])
+        self._memory.put(key, value)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        self._memory.put(key, value)
+        if self._conn is None:
+            return
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Response not serializable for disk cache: {e}")
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at) VALUES (?, ?, ?)",
+                (key, payload, time.time()),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        self._memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self._memory.get_stats()
+        with self._lock:
+            stats["disk_hits"] = self.disk_hits
+            stats["bypassed"] = self.bypassed
+        stats["disk"] = str(self.path) if self.path else None
+        stats["allow_sampled"] = self.allow_sampled
+        return stats
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def is_response_cache_enabled() -> bool:
+    return os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """설정에서 비활성화된 경우 None."""
+    global _response_cache
+    if not is_response_cache_enabled():
+        return None
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                path = os.getenv("RESPONSE_CACHE_PATH", "").strip()
+                _response_cache = ResponseCache(
+                    maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", "512")),
+                    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "86400")),
+                    path=Path(path) if path else None,
+                    allow_sampled=os.getenv("RESPONSE_CACHE_ALLOW_SAMPLED", "false").lower() in ("1", "true", "yes"),
+                )
+    return _response_cache
+
+
+def get_response_cache_stats() -> Dict[str, Any]:
+    if _response_cache is None:
+        return {"enabled": is_response_cache_enabled(), "size": 0, "hits": 0, "misses": 0}
+    stats = _response_cache.get_stats()
+    stats["enabled"] = is_response_cache_enabled()
+    return stats
@@ -0,0 +1,163 @@
+"""
+의미 기반 응답 캐시 (비슷한 질문 → 이전 RAG 답변 재사용)
+
+- 질문은 RAG 검색과 같은 쿼리 벡터(정규화, PCA 적용 후)를 사용
+- 답변한 질문 벡터를 작은 전용 FAISS 내적 인덱스에 보관 (FAISS가 없으면 numpy)
+- 코사인 유사도가 임계값 이상이면 저장된 답변 반환
+- 버킷(언어 + 템플릿/샘플링 설정)별로 분리하고, RAG 인덱스 버전이 바뀌면 전체 무효화
+"""
+
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import faiss
+    _FAISS_AVAILABLE = True
+except Exception:
+    faiss = None
+    _FAISS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    """같은 언어/설정의 질문 벡터와 답변. 용량 초과 시 오래된 항목부터 제거."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries: Deque[Tuple[np.ndarray, str, Dict[str, Any]]] = deque()
+        self._index = None
+        self._matrix: Optional[np.ndarray] = None
+        self._dirty = True
+
+    def add(self, vector: np.ndarray, prompt: str, response: Dict[str, Any]) -> None:
+        self.entries.append((vector, prompt, response))
+        if len(self.entries) > self.maxsize:
+            self.entries.popleft()
+            self._dirty = True
+        elif not self._dirty and self._index is not None:
+            self._index.add(vector.reshape(1, -1))
+        else:
+            self._dirty = True
+
+    def _rebuild(self) -> None:
+        matrix = np.ascontiguousarray(np.vstack([entry[0] for entry in self.entries]), dtype=np.float32)
+        if _FAISS_AVAILABLE:
+            self._index = faiss.IndexFlatIP(matrix.shape[1])
+            self._index.add(matrix)
+            self._matrix = None
+        else:
+            self._index = None
+            self._matrix = matrix
+        self._dirty = False
+
+    def nearest(self, vector: np.ndarray) -> Optional[Tuple[float, int]]:
+        if not self.entries:
+            return None
+        if self._dirty or (self._index is None and self._matrix is None):
+            self._rebuild()
+        query = np.ascontiguousarray(vector.reshape(1, -1), dtype=np.float32)
+        if self._index is not None:
+            scores, idxs = self._index.search(query, 1)
+            score, idx = float(scores[0][0]), int(idxs[0][0])
+        else:
+            sims = self._matrix @ query[0]
+            idx = int(np.argmax(sims))
+            score = float(sims[idx])
+        if idx < 0:
+            return None
+        return score, idx
+
+
+class SemanticCache:
+    def __init__(self, maxsize: int = 1024, threshold: float = 0.92):
+        self.maxsize = max(1, maxsize)
+        self.threshold = threshold
+        self._buckets: Dict[str, _Bucket] = {}
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _check_version(self, version: Optional[str]) -> None:
+        if version != self._version:
+            if self._buckets:
+                self.invalidations += 1
+                logger.info(f"Semantic cache invalidated (index version {self._version} -> {version})")
+            self._buckets = {}
+            self._version = version
+
+    def lookup(self, vector: np.ndarray, bucket: str, version: Optional[str]) -> Optional[Tuple[Dict[str, Any], float, str]]:
+        """임계값 이상으로 가장 가까운 (답변, 유사도, 원래 질문). 없으면 None."""
+        with self._lock:
+            self._check_version(version)
+            found = self._buckets[bucket].nearest(vector) if bucket in self._buckets else None
+            if found is None or found[0] < self.threshold:
+                self.misses += 1
+                return None
+            score, idx = found
+            _, prompt, response = self._buckets[bucket].entries[idx]
+            self.hits += 1
+            return response, score, prompt
+
+    def add(self, vector: np.ndarray, prompt: str, response: Dict[str, Any], bucket: str, version: Optional[str]) -> None:
+        with self._lock:
+            self._check_version(version)
+            if bucket not in self._buckets:
+                self._buckets[bucket] = _Bucket(self.maxsize)
+            self._buckets[bucket].add(np.asarray(vector, dtype=np.float32), prompt, response)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": sum(len(b.entries) for b in self._buckets.values()),
+                "maxsize": self.maxsize,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "index_version": self._version,
+            }
+
+
+_semantic_cache: Optional[SemanticCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def is_semantic_cache_enabled() -> bool:
+    return os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """설정에서 비활성화된 경우 None."""
+    global _semantic_cache
+    if not is_semantic_cache_enabled():
+        return None
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache(
+                    maxsize=int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+                    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+                )
+    return _semantic_cache
+
+
+def get_semantic_cache_stats() -> Dict[str, Any]:
+    if _semantic_cache is None:
+        return {"enabled": is_semantic_cache_enabled(), "size": 0, "hits": 0, "misses": 0}
+    stats = _semantic_cache.get_stats()
+    stats["enabled"] = is_semantic_cache_enabled()
+    return stats
@@ -0,0 +1,164 @@
+"""
+요청 단위 트레이싱 (구간별 소요 시간)
+
+- trace(name): 요청 루트 구간. trace_id를 contextvar에 저장 (같은 스레드/컨텍스트의 하위 구간이 공유)
+- span(name, **attrs): 하위 구간. 끝날 때 JSON 한 줄 로그(TRACE_LOG=true)와 구간별 히스토그램에 기록
+- record(name, seconds, **attrs): 다른 스레드에서 측정한 시간(LLM 큐 대기/프롬프트 평가/생성 등)을 현재 트레이스에 기록
+- get_span_stats(): 구간별 count/avg/p50/p99 + 고정 버킷 히스토그램 (GET /stats/spans)
+"""
+
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("poly.trace")
+
+# 히스토그램 버킷 상한 (ms). 마지막 버킷은 그 이상 전부
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+_trace_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+_parent: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_parent", default=None)
+
+
+def _trace_log_enabled() -> bool:
+    return os.getenv("TRACE_LOG", "false").lower() in ("1", "true", "yes")
+
+
+# 구간 로그 출력 여부. .env는 app.py가 이 모듈을 import 한 뒤에 로드되므로 첫 record()에서 결정
+_log_spans: Optional[bool] = None
+
+
+def _configure_span_log() -> bool:
+    """TRACE_LOG=true이면 stdout JSON 핸들러를 붙임 (루트 로거 레벨과 무관하게 출력)."""
+    global _log_spans
+    with _lock:
+        if _log_spans is None:
+            _log_spans = _trace_log_enabled()
+            if _log_spans and not logger.handlers:
+                handler = logging.StreamHandler(sys.stdout)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+    return _log_spans
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.recent: Deque[float] = deque(maxlen=1000)
+
+    def add(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.total_ms += ms
+        self.recent.append(ms)
+
+    def summary(self) -> Dict[str, Any]:
+        count = sum(self.counts)
+        recent = np.array(self.recent) if self.recent else None
+        return {
+            "count": count,
+            "avg_ms": round(self.total_ms / count, 2) if count else 0.0,
+            "p50_ms": round(float(np.percentile(recent, 50)), 2) if recent is not None else 0.0,
+            "p99_ms": round(float(np.percentile(recent, 99)), 2) if recent is not None else 0.0,
+            "buckets": {
+                (f"le_{bound}" if i < len(BUCKETS_MS) else "inf"): n
+                for i, (bound, n) in enumerate(zip(list(BUCKETS_MS) + [None], self.counts))
+            },
+        }
+
+
+_histograms: Dict[str, _Histogram] = {}
+_lock = threading.Lock()
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+def record(name: str, seconds: float, **attrs: Any) -> None:
+    """이미 측정된 구간 시간을 기록."""
+    ms = seconds * 1000.0
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = _Histogram()
+        hist.add(ms)
+    log_spans = _log_spans if _log_spans is not None else _configure_span_log()
+    if log_spans:
+        entry = {
+            "trace_id": _trace_id.get(),
+            "parent": _parent.get(),
+            "span": name,
+            "duration_ms": round(ms, 3),
+        }
+        entry.update(attrs)
+        logger.info(json.dumps(entry, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """
+    하위 구간 측정. yield된 dict에 값을 넣으면 로그 속성으로 함께 기록.
+    예외가 나도 시간은 기록하고 error 속성을 남김.
+    """
+    token = _parent.set(name)
+    started = time.perf_counter()
+    extra: Dict[str, Any] = dict(attrs)
+    try:
+        yield extra
+    except BaseException as e:
+        extra["error"] = type(e).__name__
+        raise
+    finally:
+        _parent.reset(token)
+        record(name, time.perf_counter() - started, **extra)
+
+
+@contextmanager
+def trace(name: str, trace_id: Optional[str] = None, **attrs: Any) -> Iterator[Dict[str, Any]]:
+    """요청 루트 구간. 새 trace_id를 만들고(또는 전달된 값 사용) 하위 구간과 공유."""
+    token = _trace_id.set(trace_id or uuid.uuid4().hex[:16])
+    try:
+        with span(name, **attrs) as extra:
+            yield extra
+    finally:
+        _trace_id.reset(token)
+
+
+def traced(name: str) -> Callable:
+    """함수 전체를 하나의 구간으로 측정하는 데코레이터."""
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_span_stats() -> Dict[str, Any]:
+    with _lock:
+        names: List[str] = sorted(_histograms)
+        return {name: _histograms[name].summary() for name in names}
+
+
+def reset_span_stats() -> None:
+    with _lock:
+        _histograms.clear()
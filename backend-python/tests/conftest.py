@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# `src.` 패키지를 import 할 수 있도록 backend-python을 경로에 추가
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,48 @@
+import numpy as np
+
+from src.services import rag_service
+
+
+class CountingModel:
+    """인코딩한 텍스트를 기록하는 가짜 임베딩 모델."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        texts = list(texts)
+        self.encoded.append(texts)
+        rng = [np.random.default_rng(abs(hash(t)) % (2**32)) for t in texts]
+        return np.vstack([r.standard_normal(16).astype(np.float32) for r in rng])
+
+
+def _build(model, monkeypatch, tmp_path, texts):
+    monkeypatch.setattr(rag_service, "_get_embedding_model", lambda: model)
+    monkeypatch.setattr(rag_service, "_get_embedding_signature", lambda: {"model": "fake", "pooling": "mean"})
+    monkeypatch.setattr(rag_service, "CACHE_EMBED_STORE", tmp_path / "chunk_embeddings.sqlite")
+    monkeypatch.setenv("RAG_EMBED_STORE", "true")
+    metas = [{"file": "doc", "page": i + 1} for i in range(len(texts))]
+    return rag_service._build_embeddings(texts, metas, target_dim=None)
+
+
+def test_second_build_reencodes_only_changed_chunks(monkeypatch, tmp_path):
+    texts = ["first page text", "second page text", "third page text"]
+    model = CountingModel()
+    emb1, chunks1, _, _ = _build(model, monkeypatch, tmp_path, texts)
+    assert sorted(model.encoded[0]) == sorted(chunks1)
+
+    changed = texts[:2] + ["third page text revised"]
+    emb2, chunks2, _, _ = _build(model, monkeypatch, tmp_path, changed)
+
+    assert len(model.encoded) == 2
+    assert model.encoded[1] == ["third page text revised"]
+    # 바뀌지 않은 청크는 이전 빌드와 같은 벡터
+    np.testing.assert_allclose(emb2[:2], emb1[:2])
+
+
+def test_unchanged_rebuild_encodes_nothing(monkeypatch, tmp_path):
+    texts = ["alpha", "beta"]
+    model = CountingModel()
+    _build(model, monkeypatch, tmp_path, texts)
+    _build(model, monkeypatch, tmp_path, texts)
+    assert len(model.encoded) == 1
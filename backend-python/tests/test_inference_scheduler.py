@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+
+from src.services.inference_scheduler import DeadlineExceededError, InferenceScheduler
+
+
+class BlockingModel:
+    """첫 호출은 release 될 때까지 막히는 가짜 llama.cpp 모델."""
+
+    def __init__(self):
+        self.prompts = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, prompt, echo=False, **kwargs):
+        self.prompts.append(prompt)
+        self.entered.set()
+        self.release.wait(timeout=5)
+        return {"choices": [{"text": prompt}]}
+
+
+def test_timed_out_job_is_not_generated():
+    model = BlockingModel()
+    scheduler = InferenceScheduler(get_model=lambda: model, get_pool=lambda: [model])
+
+    done = threading.Event()
+    first = {}
+
+    def run_first():
+        first["output"] = scheduler.complete("first", {}, timeout=5)
+        done.set()
+
+    threading.Thread(target=run_first, daemon=True).start()
+    assert model.entered.wait(timeout=5)
+
+    with pytest.raises(DeadlineExceededError):
+        scheduler.complete("second", {}, timeout=0.1)
+
+    model.release.set()
+    assert done.wait(timeout=5)
+    # 워커가 버린 작업까지 큐에서 빠질 때까지 대기
+    for _ in range(100):
+        if scheduler.get_stats()["queue_depth"] == 0:
+            break
+        threading.Event().wait(0.01)
+
+    stats = scheduler.get_stats()
+    assert model.prompts == ["first"]
+    assert first["output"]["choices"][0]["text"] == "first"
+    assert stats["queue_depth"] == 0
+    assert stats["expired"] == 1
+    assert stats["completed"] == 1
@@ -0,0 +1,58 @@
+import pytest
+
+from src.services import rag_service, response_cache
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    """문서 검색/LLM 호출을 가짜로 바꾼 RAG (캐시 설정은 기본값)."""
+    for name in (
+        "RESPONSE_CACHE_ENABLED",
+        "RESPONSE_CACHE_ALLOW_SAMPLED",
+        "RESPONSE_CACHE_PATH",
+        "RAG_CACHE_ALLOW_SAMPLED",
+        "SEMANTIC_CACHE_ENABLED",
+    ):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(response_cache, "_response_cache", None)
+    monkeypatch.setitem(rag_service._rag_system, "initialized", True)
+    monkeypatch.setitem(rag_service._rag_system, "index_version", "v1")
+
+    calls = []
+
+    def fake_completion(prompt, sampling, **kwargs):
+        calls.append(prompt)
+        return {"choices": [{"text": f"answer {len(calls)}"}], "usage": {"completion_tokens": 3}}
+
+    monkeypatch.setattr(rag_service, "retrieve_documents", lambda query, k=5: [{"content": "주차는 B동 지하", "metadata": {}}])
+    monkeypatch.setattr(rag_service, "_get_llm_model", lambda: object())
+    monkeypatch.setattr(rag_service, "run_completion", fake_completion)
+    return calls
+
+
+def test_repeated_rag_query_hits_cache_with_default_settings(rag):
+    first = rag_service.generate_rag_response("주차장은 어디인가요?")
+    second = rag_service.generate_rag_response("주차장은 어디인가요?")
+
+    assert len(rag) == 1
+    assert first["cache_hit"] is False
+    assert second["cache_hit"] is True
+    assert second["cache_type"] == "exact"
+    assert second["response"] == first["response"]
+
+
+def test_cache_key_uses_exact_prompt(rag):
+    rag_service.generate_rag_response("Where is the parking lot?", language="en")
+    other = rag_service.generate_rag_response("WHERE  is the parking lot?", language="en")
+
+    assert len(rag) == 2
+    assert other["cache_hit"] is False
+
+
+def test_rag_sampled_caching_can_be_disabled(rag, monkeypatch):
+    monkeypatch.setenv("RAG_CACHE_ALLOW_SAMPLED", "false")
+    rag_service.generate_rag_response("주차장은 어디인가요?")
+    again = rag_service.generate_rag_response("주차장은 어디인가요?")
+
+    assert len(rag) == 2
+    assert again["cache_hit"] is False
@@ -0,0 +1,25 @@
+import json
+import logging
+
+from src.services import tracing
+
+
+def test_trace_log_set_after_import_enables_span_log(monkeypatch, capsys):
+    # app.py는 tracing을 import 한 뒤에 .env를 로드함
+    monkeypatch.setattr(tracing, "_log_spans", None)
+    monkeypatch.setattr(tracing.logger, "handlers", [])
+    monkeypatch.setattr(tracing.logger, "propagate", True)
+    monkeypatch.setattr(tracing.logger, "level", logging.NOTSET)
+    monkeypatch.setenv("TRACE_LOG", "true")
+
+    with tracing.trace("http.test") as extra:
+        extra["status"] = 200
+        with tracing.span("child", docs=3):
+            pass
+
+    entries = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [e["span"] for e in entries] == ["child", "http.test"]
+    assert entries[0]["parent"] == "http.test"
+    assert entries[0]["docs"] == 3
+    assert entries[1]["status"] == 200
+    assert entries[0]["trace_id"] == entries[1]["trace_id"]
@@ -0,0 +1,13 @@
+"""
+운영용 WSGI 진입점
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+preload_app=True 이면 이 모듈은 gunicorn 마스터에서 한 번만 import 되어
+모델/RAG 인덱스를 로드하고, 워커는 fork 후 읽기 전용 가중치와 인덱스 페이지를
+copy-on-write로 공유한다.
+"""
+
+from app import create_app
+
+app = create_app()